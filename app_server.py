@@ -1,35 +1,61 @@
-import bjoern
-import os
-import signal
-import socket
+"""
+Docker Compose UI application server
+
+a gunicorn master supervises WEB_WORKERS forked workers (one per CPU by
+default), restarts the ones that die or stop answering and drains them on
+SIGTERM. Each worker serves requests from a pool of WEB_THREADS threads, so
+a blocking docker call does not stall the other requests of the worker.
+"""
 
+import multiprocessing
+import os
+from gunicorn.app.base import BaseApplication
 
 from main import app
+from scripts.metrics import clear as clear_metrics
+from scripts.startup import startup
+
+
+class AppServer(BaseApplication):
+    """
+    gunicorn application configured from a dict instead of the command line
+    """
+
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super(AppServer, self).__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def server_options():
+    """
+    gunicorn settings, overridable through the environment
+    """
+    return {
+        'bind': '%s:%s' % (os.getenv('HOST', '0.0.0.0'), os.getenv('PORT', '1028')),
+        'workers': int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count())),
+        'worker_class': 'gthread',
+        'threads': int(os.getenv('WEB_THREADS', '16')),
+        # a worker missing its heartbeat for this long is killed and respawned
+        'timeout': int(os.getenv('WORKER_TIMEOUT', '60')),
+        # time given to in-flight requests after SIGTERM
+        'graceful_timeout': int(os.getenv('GRACEFUL_TIMEOUT', '30')),
+        'keepalive': 5,
+        # import main once in the master so that respawned workers start instantly
+        'preload_app': True,
+        # counters left by a previous run of the server
+        'on_starting': lambda server: clear_metrics(),
+        # imports, docker and git warm up in each worker, after it started answering
+        'post_worker_init': lambda worker: startup(),
+    }
+
 
-host = '0.0.0.0'
-port = 1028
-NUM_WORKERS = 2
-worker_pids = []
-
-
-bjoern.listen(app, host, port)
-for _ in range(NUM_WORKERS):
-    pid = os.fork()
-    if pid > 0:
-        # in master
-        worker_pids.append(pid)
-    elif pid == 0:
-        # in worker
-        try:
-            bjoern.run()
-        except KeyboardInterrupt:
-            pass
-        exit()
-
-try:
-    for _ in range(NUM_WORKERS):
-        os.wait()
-except KeyboardInterrupt:
-    get_project(sPath).down(remove_image_type=False, include_volumes=None)
-    for pid in worker_pids:
-        os.kill(pid, signal.SIGINT)
+if __name__ == "__main__":
+    AppServer(app, server_options()).run()
@@ -0,0 +1,211 @@
+"""
+latency and throughput of the API endpoints against a fake docker daemon
+
+generates users/<user>/<project> trees in a temporary folder, seeds the
+fake daemon with the containers of every project and calls the endpoints
+through the flask test client from concurrent threads.
+
+usage: python3 -m benchmarks.endpoints [--users N] [--projects N] [--containers N]
+       [--log-lines N] [--log-line-bytes N] [--latency-ms MS] [--requests N]
+       [--concurrency N] [--no-events] [endpoint ...]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from json import dumps, loads
+from time import sleep, time
+from benchmarks.fake_docker import FakeDockerDaemon
+
+ENDPOINTS = ('list_projects', 'overview', 'project_containers', 'logs', 'up_')
+COMPOSE_FILE = '''version: "2.2"
+services:
+  web:
+    image: busybox
+    command: sleep 3600
+    scale: %d
+'''
+JOB_DONE = ('finished', 'failed', 'cancelled')
+
+
+def make_tree(root, users, projects, containers):
+    """
+    users/<user>/<project>/docker-compose.yml scaled to containers under root; returns the (user, project) pairs
+    """
+    pairs = []
+    for user_number in range(users):
+        user = 'user%d' % user_number
+        for project_number in range(projects):
+            # project names are unique across users, like compose project names on a shared daemon
+            project = 'u%dp%d' % (user_number, project_number)
+            folder = os.path.join(root, 'users', user, project)
+            os.makedirs(folder)
+            with open(os.path.join(folder, 'docker-compose.yml'), 'w') as compose_file:
+                compose_file.write(COMPOSE_FILE % containers)
+            pairs.append((user, project))
+    return pairs
+
+def percentile(values, fraction):
+    """
+    nearest rank percentile of a sorted list
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Runner(object):
+    """
+    calls one endpoint from concurrent flask test clients
+    """
+
+    def __init__(self, app, pairs, requests, concurrency):
+        self.app = app
+        self.pairs = pairs
+        self.requests = requests
+        self.concurrency = concurrency
+
+    def _client(self, user):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['username'] = user
+        return client
+
+    @staticmethod
+    def _check(response):
+        if response.status_code >= 400:
+            raise RuntimeError('%d %s' % (response.status_code, response.get_data(as_text=True)[:200]))
+        return response
+
+    def call(self, endpoint, client, project):
+        """
+        one call of endpoint on project
+        """
+        if endpoint == 'list_projects':
+            self._check(client.get('/api/v1/projects'))
+        elif endpoint == 'overview':
+            self._check(client.get('/api/v1/overview'))
+        elif endpoint == 'project_containers':
+            self._check(client.get('/api/v1/projects/' + project))
+        elif endpoint == 'logs':
+            self._check(client.get('/api/v1/logs/' + project))
+        elif endpoint == 'up_':
+            # queued as a job: measured until the job is done
+            job_id = loads(self._check(client.post('/api/v1/projects', data=dumps({'id': project})))
+                           .get_data(as_text=True))['job']
+            job = dict(state=None)
+            while job['state'] not in JOB_DONE:
+                sleep(0.01)
+                job = loads(self._check(client.get('/api/v1/jobs/' + job_id)).get_data(as_text=True))
+            if job['state'] != 'finished':
+                raise RuntimeError('up %s %s: %s' % (project, job['state'], job['error']))
+
+    def run(self, endpoint):
+        """
+        (sorted latencies in ms, errors, wall clock seconds) of self.requests calls
+        """
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        counter = iter(range(self.requests))
+
+        def worker():
+            clients = {}
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    return
+                user, project = self.pairs[number % len(self.pairs)]
+                if user not in clients:
+                    clients[user] = self._client(user)
+                start = time()
+                try:
+                    self.call(endpoint, clients[user], project)
+                except Exception as err: # pylint: disable=broad-except
+                    with lock:
+                        errors.append(str(err))
+                    continue
+                with lock:
+                    latencies.append((time() - start) * 1000)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+        start = time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(latencies), errors, time() - start
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='benchmark the API endpoints against a fake docker daemon')
+    parser.add_argument('endpoints', nargs='*', help='some of ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--projects', type=int, default=10, help='projects per user')
+    parser.add_argument('--containers', type=int, default=3, help='containers per project')
+    parser.add_argument('--log-lines', type=int, default=1000, help='log lines per container')
+    parser.add_argument('--log-line-bytes', type=int, default=120)
+    parser.add_argument('--latency-ms', type=float, default=1.0, help='latency of every docker API call')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--no-events', action='store_true',
+                        help='fail the docker events stream, so that no container index is kept')
+    args = parser.parse_args(argv)
+    unknown = [endpoint for endpoint in args.endpoints if endpoint not in ENDPOINTS]
+    if unknown:
+        parser.error('unknown endpoints: ' + ', '.join(unknown))
+    args.endpoints = args.endpoints or list(ENDPOINTS)
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    root = tempfile.mkdtemp(prefix='dcui-bench-')
+    daemon = FakeDockerDaemon(os.path.join(root, 'docker.sock'), args.latency_ms / 1000,
+                              args.log_lines, args.log_line_bytes, not args.no_events).start()
+    cwd = os.getcwd()
+    try:
+        pairs = make_tree(root, args.users, args.projects, args.containers)
+
+        os.environ['DOCKER_HOST'] = daemon.base_url
+        os.environ.setdefault('JOBS_DIR', os.path.join(root, 'jobs'))
+        os.environ.setdefault('METRICS_DIR', os.path.join(root, 'metrics'))
+        os.environ.pop('GIT_REPO', None)
+        from main import app # pylint: disable=import-outside-toplevel
+        from scripts.bridge import get_project # pylint: disable=import-outside-toplevel
+        os.chdir(root)
+
+        for user, project in pairs:
+            # containers up to date with their service, so that up only has to converge
+            config_hash = get_project(os.path.join('users', user, project)).get_service('web').config_hash
+            for number in range(1, args.containers + 1):
+                daemon.add_container(project, 'web', number, config_hash=config_hash)
+        daemon.calls.clear()
+
+        print('%d users, %d projects, %d containers, %d log lines of %d bytes, %.1f ms docker latency' % (
+            args.users, len(pairs), len(daemon.containers), args.log_lines, args.log_line_bytes,
+            args.latency_ms))
+        print('%-20s %8s %8s %10s %10s %10s' % ('endpoint', 'ok', 'errors', 'p50 ms', 'p99 ms', 'req/s'))
+        runner = Runner(app, pairs, args.requests, args.concurrency)
+        for endpoint in args.endpoints:
+            latencies, errors, seconds = runner.run(endpoint)
+            print('%-20s %8d %8d %10.1f %10.1f %10.1f' % (
+                endpoint, len(latencies), len(errors), percentile(latencies, 0.5),
+                percentile(latencies, 0.99), len(latencies) / seconds))
+            if errors:
+                print('    first error: ' + errors[0])
+
+        print('\ndocker API calls')
+        for call, count in sorted(daemon.calls.items(), key=lambda item: -item[1]):
+            print('%8d %s' % (count, call))
+    finally:
+        os.chdir(cwd)
+        daemon.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
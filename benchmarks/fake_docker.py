@@ -0,0 +1,400 @@
+"""
+stand-in docker Engine API served on a unix socket
+
+containers, networks and images only live in memory. Every answer is
+delayed by a fixed latency, container logs are generated with a configurable
+line count and size, and the calls made are counted per endpoint.
+
+usage: python3 -m benchmarks.fake_docker socket_path [latency_ms]
+"""
+
+import os
+import re
+import socketserver
+import struct
+import sys
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler
+from json import dumps, loads
+from time import sleep, time
+from urllib.parse import urlparse, parse_qs
+from uuid import uuid4
+
+API_VERSION = '1.30'
+LABEL_PROJECT = 'com.docker.compose.project'
+LABEL_SERVICE = 'com.docker.compose.service'
+LABEL_NUMBER = 'com.docker.compose.container-number'
+LABEL_ONE_OFF = 'com.docker.compose.oneoff'
+LABEL_VERSION = 'com.docker.compose.version'
+LABEL_CONFIG_HASH = 'com.docker.compose.config-hash'
+# version label of the seeded containers, the docker-compose of requirements.txt
+COMPOSE_VERSION = '1.23.2'
+
+_API_VERSION = re.compile(r'^/v[0-9.]+')
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # concurrent clients must not find the listen backlog full (EAGAIN on connect)
+    request_queue_size = 128
+
+
+class FakeDockerDaemon(object):
+    """
+    in-memory docker daemon, started on socket_path by start()
+    """
+
+    def __init__(self, socket_path, latency=0.0, log_lines=100, log_line_bytes=80, events=True):
+        self.socket_path = socket_path
+        self.latency = latency
+        self.log_lines = log_lines
+        self.log_line_bytes = log_line_bytes
+        self.events = events
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.containers = {}
+        self.networks = {}
+        self.calls = {}
+        self.server = None
+
+    @property
+    def base_url(self):
+        """
+        DOCKER_HOST of the daemon
+        """
+        return 'unix://' + self.socket_path
+
+    def start(self):
+        """
+        serve the API in a background thread
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.server = _UnixHTTPServer(self.socket_path, _handler(self))
+        thread = threading.Thread(target=self.server.serve_forever, name='fake-docker')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """
+        stop serving and remove the socket
+        """
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def add_container(self, project, service, number, running=True, tty=False, config_hash=''):
+        """
+        a compose container of project, as if created by docker-compose up;
+        up recreates it unless config_hash is the one of the service
+        """
+        name = '%s_%s_%d' % (project, service, number)
+        labels = {LABEL_PROJECT: project, LABEL_SERVICE: service,
+                  LABEL_NUMBER: str(number), LABEL_ONE_OFF: 'False',
+                  LABEL_VERSION: COMPOSE_VERSION, LABEL_CONFIG_HASH: config_hash}
+        return self._create(name, dict(Image='busybox', Cmd=['sleep', '3600'], Labels=labels, Tty=tty),
+                            running)
+
+    def _create(self, name, config, running=False):
+        container_id = uuid4().hex + uuid4().hex
+        container = {
+            'Id': container_id,
+            'Created': datetime.utcnow().isoformat() + 'Z',
+            'Name': '/' + (name or container_id[:12]),
+            'Image': 'sha256:' + '0' * 64,
+            'Config': {
+                'Image': config.get('Image', 'busybox'),
+                'Cmd': config.get('Cmd'),
+                'Entrypoint': config.get('Entrypoint'),
+                'Env': config.get('Env') or [],
+                'Labels': config.get('Labels') or {},
+                'Tty': config.get('Tty', False),
+                'ExposedPorts': config.get('ExposedPorts') or {}},
+            'HostConfig': config.get('HostConfig') or {},
+            'State': {},
+            'NetworkSettings': {'Ports': {}, 'Networks': {}},
+            'Mounts': [{'Source': '/tmp', 'Destination': '/data', 'Mode': '', 'RW': True}]}
+        self._set_running(container, running)
+        with self.lock:
+            self.containers[container_id] = container
+        return container
+
+    @staticmethod
+    def _set_running(container, running):
+        container['State'] = {'Status': 'running' if running else 'exited', 'Running': running,
+                              'Paused': False, 'Restarting': False, 'OOMKilled': False, 'Dead': False,
+                              'Pid': 1 if running else 0, 'ExitCode': 0,
+                              'StartedAt': datetime.utcnow().isoformat() + 'Z',
+                              'FinishedAt': '0001-01-01T00:00:00Z'}
+
+    def find_container(self, key):
+        """
+        container by id, id prefix or name
+        """
+        with self.lock:
+            if key in self.containers:
+                return self.containers[key]
+            for container in self.containers.values():
+                if container['Name'] == '/' + key or container['Id'].startswith(key):
+                    return container
+        return None
+
+    def summary(self, container):
+        """
+        a container as listed by GET /containers/json
+        """
+        return {'Id': container['Id'], 'Names': [container['Name']], 'Image': container['Config']['Image'],
+                'ImageID': container['Image'], 'Command': ' '.join(container['Config']['Cmd'] or []),
+                'Created': int(time()), 'State': container['State']['Status'],
+                'Status': 'Up 1 hour' if container['State']['Running'] else 'Exited (0) 1 hour ago',
+                'Ports': [], 'Labels': container['Config']['Labels'], 'Mounts': container['Mounts'],
+                'NetworkSettings': {'Networks': container['NetworkSettings']['Networks']}}
+
+    def list_containers(self, query):
+        """
+        containers matching the all and label filters of a list query
+        """
+        filters = loads(query.get('filters', ['{}'])[0])
+        labels = filters.get('label', [])
+        if isinstance(labels, dict):
+            labels = [label for label, enabled in labels.items() if enabled]
+        show_all = query.get('all', ['0'])[0] in ('1', 'true', 'True')
+
+        with self.lock:
+            items = list(self.containers.values())
+        matching = []
+        for container in items:
+            if not show_all and not container['State']['Running']:
+                continue
+            container_labels = container['Config']['Labels']
+            if all(_label_matches(container_labels, label) for label in labels):
+                matching.append(self.summary(container))
+        return matching
+
+    def logs(self, container, query):
+        """
+        generated log lines of a container, multiplexed unless it has a tty
+        """
+        count = self.log_lines
+        tail = query.get('tail', ['all'])[0]
+        if tail != 'all':
+            count = min(count, int(tail))
+        timestamps = query.get('timestamps', ['0'])[0] in ('1', 'true', 'True')
+        start = datetime.utcnow() - timedelta(seconds=count)
+        text = 'x' * max(0, self.log_line_bytes - 1)
+
+        chunks = []
+        for number in range(count):
+            line = text + '\n'
+            if timestamps:
+                line = (start + timedelta(seconds=number)).strftime('%Y-%m-%dT%H:%M:%S.%f000Z ') + line
+            data = line.encode('utf8')
+            if not container['Config']['Tty']:
+                data = struct.pack('>BxxxL', 1, len(data)) + data
+            chunks.append(data)
+        return b''.join(chunks)
+
+    def count_call(self, method, path):
+        """
+        count a call per method and endpoint
+        """
+        parts = path.split('/')
+        if len(parts) > 2 and parts[1] in ('containers', 'networks', 'images') and parts[2] not in ('json', 'create'):
+            parts = parts[:2] + ['{id}'] + parts[3:]
+        endpoint = method + ' ' + '/'.join(parts)
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+    def route(self, method, path, query, body):
+        """
+        (status, json or bytes answer) of an API call
+        """
+        # pylint: disable=too-many-return-statements,too-many-branches
+        parts = [part for part in path.split('/') if part]
+        if path == '/_ping':
+            return 200, b'OK'
+        if path == '/version':
+            return 200, {'Version': '18.09.0', 'ApiVersion': API_VERSION, 'MinAPIVersion': '1.12',
+                         'Os': 'linux', 'Arch': 'amd64', 'KernelVersion': '4.15.0', 'GoVersion': 'go1.10'}
+        if path == '/info':
+            with self.lock:
+                running = len([item for item in self.containers.values() if item['State']['Running']])
+                total = len(self.containers)
+            return 200, {'ID': 'FAKE', 'Name': 'fake-docker', 'ServerVersion': '18.09.0',
+                         'Containers': total, 'ContainersRunning': running,
+                         'ContainersStopped': total - running, 'Images': 1, 'Driver': 'overlay2',
+                         'NCPU': 1, 'MemTotal': 1 << 30, 'Swarm': {'LocalNodeState': 'inactive'}}
+        if path == '/volumes':
+            return 200, {'Volumes': [], 'Warnings': None}
+
+        if parts[0] == 'containers':
+            return self._route_container(method, parts, query, body)
+        if parts[0] == 'networks':
+            return self._route_network(method, parts, body)
+        if parts[0] == 'images':
+            if parts[1:] == ['json']:
+                return 200, []
+            return 200, {'Id': 'sha256:' + '0' * 64, 'RepoTags': ['/'.join(parts[1:-1])], 'RepoDigests': [],
+                         'Config': {'Cmd': ['sh'], 'Entrypoint': None, 'Env': [], 'Volumes': None,
+                                    'ExposedPorts': None, 'Labels': None},
+                         'ContainerConfig': {}, 'Size': 1 << 20}
+        return 404, {'message': 'page not found'}
+
+    def _route_container(self, method, parts, query, body):
+        # pylint: disable=too-many-return-statements
+        if parts[1:] == ['json']:
+            return 200, self.list_containers(query)
+        if parts[1:] == ['create']:
+            container = self._create(query.get('name', [None])[0], loads(body or b'{}'))
+            return 201, {'Id': container['Id'], 'Warnings': None}
+
+        container = self.find_container(parts[1])
+        if container is None:
+            return 404, {'message': 'No such container: ' + parts[1]}
+        action = parts[2] if len(parts) > 2 else None
+        if method == 'DELETE' and action is None:
+            with self.lock:
+                self.containers.pop(container['Id'], None)
+            return 204, b''
+        if action == 'json':
+            return 200, container
+        if action == 'logs':
+            return 200, self.logs(container, query)
+        if action in ('start', 'restart', 'unpause'):
+            self._set_running(container, True)
+            return 204, b''
+        if action in ('stop', 'kill'):
+            self._set_running(container, False)
+            return 204, b''
+        if action == 'wait':
+            self._set_running(container, False)
+            return 200, {'StatusCode': 0}
+        if action == 'rename':
+            container['Name'] = '/' + query['name'][0]
+            return 204, b''
+        return 200, b''
+
+    def _route_network(self, method, parts, body):
+        if len(parts) == 1:
+            with self.lock:
+                return 200, list(self.networks.values())
+        if parts[1] == 'create':
+            options = loads(body or b'{}')
+            network = {'Name': options['Name'], 'Id': uuid4().hex + uuid4().hex, 'Scope': 'local',
+                       'Driver': options.get('Driver') or 'bridge', 'Options': options.get('Options') or {},
+                       'IPAM': options.get('IPAM') or {'Driver': 'default', 'Options': None, 'Config': []},
+                       'Internal': options.get('Internal', False), 'Attachable': options.get('Attachable', False),
+                       'Labels': options.get('Labels') or {}, 'Containers': {}}
+            with self.lock:
+                self.networks[network['Name']] = network
+            return 201, {'Id': network['Id'], 'Warning': ''}
+
+        with self.lock:
+            network = self.networks.get(parts[1]) or next(
+                (item for item in self.networks.values() if item['Id'].startswith(parts[1])), None)
+            if network is not None and method == 'DELETE':
+                del self.networks[network['Name']]
+        if network is None:
+            return 404, {'message': 'network %s not found' % parts[1]}
+        if method == 'GET':
+            return 200, network
+        return 200, b''
+
+
+def _label_matches(labels, label):
+    key, _, value = label.partition('=')
+    return key in labels and (not value or labels[key] == value)
+
+def _handler(daemon):
+    """
+    request handler class serving daemon
+    """
+
+    class FakeDockerHandler(BaseHTTPRequestHandler):
+        """
+        HTTP/1.1 keep-alive handler of the fake API
+        """
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args): # pylint: disable=redefined-builtin
+            pass
+
+        def _handle(self):
+            url = urlparse(self.path)
+            path = _API_VERSION.sub('', url.path) or '/'
+            query = parse_qs(url.query)
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            daemon.count_call(self.command, path)
+
+            if path == '/events':
+                self._events()
+                return
+            if path.endswith('/attach'):
+                self._attach()
+                return
+
+            if daemon.latency:
+                sleep(daemon.latency)
+            status, answer = daemon.route(self.command, path, query, body)
+            if isinstance(answer, bytes):
+                content_type = 'application/octet-stream' if answer else 'text/plain'
+            else:
+                answer = dumps(answer).encode('utf8')
+                content_type = 'application/json'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(answer)))
+            self.end_headers()
+            self.wfile.write(answer)
+
+        def _events(self):
+            """
+            an events stream that stays open and silent until the daemon stops
+            """
+            if not daemon.events:
+                self.send_error(404, 'events disabled')
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.flush()
+            daemon.stopped.wait()
+            self.wfile.write(b'0\r\n\r\n')
+            self.close_connection = True
+
+        def _attach(self):
+            """
+            a hijacked attach stream without output
+            """
+            self.send_response(101)
+            self.send_header('Content-Type', 'application/vnd.docker.raw-stream')
+            self.send_header('Connection', 'Upgrade')
+            self.send_header('Upgrade', 'tcp')
+            self.end_headers()
+            self.close_connection = True
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    return FakeDockerHandler
+
+
+def main():
+    socket_path = sys.argv[1]
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0
+    daemon = FakeDockerDaemon(socket_path, latency).start()
+    print('fake docker daemon listening on ' + daemon.base_url)
+    try:
+        daemon.stopped.wait()
+    except KeyboardInterrupt:
+        daemon.stop()
+
+
+if __name__ == '__main__':
+    main()
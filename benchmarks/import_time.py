@@ -0,0 +1,80 @@
+"""
+import time of the app entry point, against a budget
+
+imports main in fresh interpreters, fails when the best of RUNS takes more
+than the budget or when a module meant to be loaded lazily was imported,
+and lists the slowest imports reported by python -X importtime.
+
+usage: python3 -m benchmarks.import_time [budget_ms]
+"""
+
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', '250'))
+RUNS = 5
+TOP = 10
+# loaded by the startup phase or on first use, never by importing main
+LAZY_MODULES = ('compose', 'docker', 'git', 'requests')
+ENTRY_POINT = 'main'
+
+CHILD = '''
+import sys, time
+start = time.perf_counter()
+import {entry_point}
+print((time.perf_counter() - start) * 1000, *[name for name in {lazy!r} if name in sys.modules])
+'''
+
+
+def _root():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure():
+    """
+    (import time in ms, lazy modules that got imported) of one fresh interpreter
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD.format(entry_point=ENTRY_POINT, lazy=LAZY_MODULES)],
+        cwd=_root(), universal_newlines=True)
+    fields = output.strip().splitlines()[-1].split()
+    return float(fields[0]), fields[1:]
+
+def slowest_imports():
+    """
+    (cumulative us, module) of the TOP slowest imports
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ENTRY_POINT],
+                             cwd=_root(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    imports = []
+    for line in process.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            imports.append((int(fields[1]), fields[2].rstrip()))
+    return sorted(imports, reverse=True)[:TOP]
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_BUDGET_MS
+    results = [measure() for _ in range(RUNS)]
+    best = min(elapsed for elapsed, _ in results)
+    loaded = sorted(set(name for _, names in results for name in names))
+
+    print('import %s: best %.1f ms of %d runs, budget %.1f ms' % (ENTRY_POINT, best, RUNS, budget))
+    print('\n%12s  %s' % ('cumulative', 'module'))
+    for cumulative, module in slowest_imports():
+        print('%9.1f ms  %s' % (cumulative / 1000.0, module))
+
+    failed = False
+    if best > budget:
+        print('\nover budget by %.1f ms' % (best - budget))
+        failed = True
+    if loaded:
+        print('\nimported eagerly: ' + ', '.join(loaded))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+ps_ latency versus container count, against a fake docker API
+
+usage: python3 -m benchmarks.ps_latency [latency_ms]
+"""
+
+import sys
+from time import sleep, time
+import scripts.bridge as bridge
+
+COUNTS = (1, 5, 10, 20, 50)
+RUNS = 5
+
+
+class FakeDockerClient(object):
+    """
+    answers containers() and inspect_container() after a fixed latency
+    """
+
+    def __init__(self, project, count, latency):
+        self.project = project
+        self.count = count
+        self.latency = latency
+
+    def containers(self, all=False, filters=None): # pylint: disable=redefined-builtin,unused-argument
+        sleep(self.latency)
+        return [{'Id': self._id(number), 'Image': 'busybox',
+                 'Names': ['/%s_web_%d' % (self.project, number)]} for number in range(1, self.count + 1)]
+
+    def inspect_container(self, container_id):
+        sleep(self.latency)
+        number = int(container_id[-6:])
+        return {
+            'Id': container_id,
+            'Image': 'busybox',
+            'Name': '/%s_web_%d' % (self.project, number),
+            'Config': {
+                'Cmd': ['sh', '-c', 'sleep 3600'],
+                'Entrypoint': None,
+                'Labels': {
+                    'com.docker.compose.project': self.project,
+                    'com.docker.compose.service': 'web',
+                    'com.docker.compose.container-number': str(number),
+                    'com.docker.compose.oneoff': 'False'}},
+            'State': {'Running': True, 'Paused': False, 'Restarting': False,
+                      'ExitCode': 0, 'Status': 'running'},
+            'NetworkSettings': {'Ports': {}},
+            'Mounts': [{'Source': '/tmp', 'Destination': '/data'}]}
+
+    @staticmethod
+    def _id(number):
+        return '%058x%06d' % (0, number)
+
+
+class FakeProject(object):
+    """
+    the subset of compose.project.Project that ps_ relies on
+    """
+
+    def __init__(self, client):
+        self.name = client.project
+        self.client = client
+        self.service_names = ['web']
+
+    def labels(self):
+        return ['com.docker.compose.project=' + self.name, 'com.docker.compose.oneoff=False']
+
+
+def measure(count, latency):
+    """
+    best of RUNS ps_ calls, in milliseconds
+    """
+    best = None
+    for _ in range(RUNS):
+        project = FakeProject(FakeDockerClient('bench', count, latency))
+        start = time()
+        items = bridge.ps_(project)
+        elapsed = (time() - start) * 1000
+        assert len(items) == count
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.005
+    workers = bridge.PS_WORKERS
+
+    print('%10s %12s %12s' % ('containers', 'serial ms', '%d workers ms' % workers))
+    for count in COUNTS:
+        bridge.PS_WORKERS = 1
+        serial = measure(count, latency)
+        bridge.PS_WORKERS = workers
+        parallel = measure(count, latency)
+        print('%10d %12.1f %12.1f' % (count, serial, parallel))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,54 @@
 import os
-from scripts.git_repo import git_pull, git_repo, GIT_YML_PATH, git_clone
+from scripts.git_repo import git_clone, shared_mirror
 import hashlib
+from scripts.port_table import allocate_port
+from scripts.upstream_map import update_upstream_map
 import sys
-import js2py
-from json import loads
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from scripts.cloudflare import cloudflare_site, queue_create, flush
 
-def createProject(item):
+THEIA_REPO = "https://github.com/rhildred/theia-remote.git"
+nWorkers = int(os.getenv("THEIA_WORKERS", "8"))
+
+def createProject(item, sMirror=None):
+    """
+    provision the theia workspace of user item, returns (item, status, seconds)
+    """
+    nStart = time()
     m = hashlib.shake_128()
     m.update(item.encode('utf-8'))
     sFolder = m.hexdigest(4) + "-" + item
-    nPort = example.crc16(sFolder + "." + oCreds["Site"])
-    git_clone("https://github.com/rhildred/theia-remote.git", "./users/" + item + '/' +  sFolder)
-    env_file = open("./users/" + item + '/' +  sFolder + "/.env", "w")
-    env_file.write("RHPORT=" + str(nPort))
-    env_file.close()
-    dictToSend = {'type':"CNAME", 'name':sFolder, 'content': oCreds["Site"], 'proxied': True }
-    dictHeaders = {"X-Auth-Email":oCreds["EmailID"], "X-Auth-Key":oCreds["SecretKey"]}
-    res = requests.post('https://api.cloudflare.com/client/v4/zones/' + oCreds["ZoneID"] + "/dns_records", json=dictToSend, headers=dictHeaders)
-    print('response from server:',res.text)
+    sPath = "./users/" + item + '/' +  sFolder
+    if os.path.isfile(sPath + "/.env"):
+        return (item, "skipped", time() - nStart)
+    try:
+        nPort = allocate_port(sFolder + "." + sSite)
+        if not os.path.isdir(sPath + "/.git"):
+            git_clone(THEIA_REPO, sPath, sMirror, False)
+        env_file = open(sPath + "/.env", "w")
+        env_file.write("RHPORT=" + str(nPort))
+        env_file.close()
+        queue_create(sFolder)
+        return (item, "created", time() - nStart)
+    except Exception as e:
+        return (item, "failed: " + str(e), time() - nStart)
 
-dir_path = os.path.dirname(os.path.realpath(__file__))
-eval_result, example = js2py.run_file(dir_path + '/static/scripts/proxyport.js')
-with open('cloudflare.json') as json_data_file:
-    oCreds = loads(json_data_file.read())
+sSite = cloudflare_site()
 
 if len(sys.argv) > 1:
-	createProject(sys.argv[1])
+	aResults = [createProject(sys.argv[1])]
 else:
-    for item in os.listdir("users"):
-        if os.path.isdir(os.path.join("users", item)):
-            createProject(item)
+    aUsers = sorted(item for item in os.listdir("users") if os.path.isdir(os.path.join("users", item)))
+    # the same mirror as the projects created from THEIA_REPO in the UI
+    sMirror = shared_mirror(THEIA_REPO)
+    with ThreadPoolExecutor(max_workers=nWorkers) as executor:
+        aResults = list(executor.map(lambda item: createProject(item, sMirror), aUsers))
+
+update_upstream_map(sSite)
+flush()
+
+for sUser, sStatus, nSeconds in aResults:
+    print("%-30s %8.1fs  %s" % (sUser, nSeconds, sStatus))
+for sStatus in ("created", "skipped", "failed"):
+    print("%s: %d" % (sStatus, len([r for r in aResults if r[1].startswith(sStatus)])))
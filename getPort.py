@@ -1,12 +1,9 @@
-import js2py
 import sys
-import os
+from scripts.proxyport import crc16_ports
 
 
-dir_path = os.path.dirname(os.path.realpath(__file__))
-eval_result, example = js2py.run_file(dir_path + '/static/scripts/proxyport.js')
-
 if len(sys.argv) > 1:
-	print(example.crc16(sys.argv[1]))
+	for sHost, nPort in crc16_ports(sys.argv[1:]).items():
+		print(nPort if len(sys.argv) == 2 else sHost + " " + str(nPort))
 else:
 	print("example usage python3 " + sys.argv[0] + " test-rhildred.rhlab.io")
@@ -3,26 +3,51 @@ Docker Compose UI, flask based application
 """
 
 from json import loads
+import hashlib
+import hmac
 import logging
 import os
 import traceback
 from shutil import rmtree
-from compose.service import ImageType, BuildAction
-import docker
-import requests
-from flask import Flask, jsonify, request, abort, session, redirect, url_for, render_template
-from scripts.git_repo import git_pull, git_repo, GIT_YML_PATH, git_clone
-from scripts.bridge import ps_, get_project, get_container_from_id, get_yml_path, containers, project_config, info
-from scripts.find_files import find_yml_files, get_readme_file, get_logo_file
-from scripts.requires_auth import requires_auth, authentication_enabled, \
+from time import time
+from flask import Flask, jsonify, request, abort, session, redirect, url_for, render_template, \
+  Response, stream_with_context, g
+from scripts.git_repo import git_repo, GIT_YML_PATH, git_clone, cached_mirror, git_sync_state, \
+  request_git_sync
+from scripts.client_pool import reset_clients
+from scripts.bridge import ps_, get_project, get_container_from_id, get_yml_path, project_config, \
+  evict_project
+from scripts.assets import project_asset, assets_metadata, README, LOGO
+from scripts.overview import projects_overview, active_projects, container_counts, PAGE_SIZE
+from scripts.health import liveness, readiness, readiness_all, daemon_info
+from scripts.docker_hosts import hosts, name_of, add_host, remove_host, bind, bindings, host_for, \
+  select_host, selected_host, current_host, DEFAULT_HOST
+from scripts.project_registry import get_projects, invalidate, start_git_refresh
+from scripts.requires_auth import requires_auth, requires_admin, is_admin, authentication_enabled, \
   disable_authentication, set_authentication
 from scripts.manage_project import manage
+from scripts.log_stream import stream_logs
+from scripts.jobs import submit, get_job, list_jobs, cancel
+from scripts.container_state import get_index, forget_index
+from scripts.push import watch_project
+from scripts.upstream_map import update_upstream_map
+from scripts.port_table import allocate_port, release_port
+from scripts.cloudflare import cloudflare_site, queue_create, queue_delete
+from scripts.compose_registry import COMPOSE_REGISTRY, search as registry_search, yml as registry_yml
+from scripts.idle import wake
+from scripts.lazy import lazy_import, is_instance
+from scripts.startup import startup
+from scripts.metrics import inc, observe, render as render_metrics
 import uuid
 
+compose_service = lazy_import('compose.service')
+requests = lazy_import('requests')
 
 # Flask Application
 API_V1 = '/api/v1/'
-COMPOSE_REGISTRY = os.getenv('DOCKER_COMPOSE_REGISTRY')
+GIT_WEBHOOK_SECRET = os.getenv('GIT_WEBHOOK_SECRET')
+# interpolated by compose files, set before any project is parsed and cached
+os.environ["CURRENT_UID"] = str(os.getuid())
 
 logging.basicConfig(level=logging.INFO)
 app = Flask(__name__, static_url_path='')
@@ -43,16 +68,14 @@ def load_projects(sPath):
     """
     load project definitions (docker-compose.yml files)
     """
-    projects = {}
-
     if git_repo:
-        git_pull()
-        projects = find_yml_files(GIT_YML_PATH)
-    else:
-        projects = find_yml_files(sPath)
+        start_git_refresh()
+        if not os.path.isdir(GIT_YML_PATH):
+            # first clone still running in the background
+            return {}
+        return get_projects(GIT_YML_PATH)
 
-    logging.info(projects)
-    return projects
+    return get_projects(sPath)
 
 
 
@@ -63,8 +86,32 @@ def get_project_with_name(path, name):
     """
     projects = load_projects(path)
     path = projects[name]
+    # the rest of the request talks to the docker host of the project
+    select_host(host_for(session["username"], name))
     return get_project(path)
 
+def queue_job(name, command, func):
+    """
+    run a docker compose operation as a background job
+    """
+    job = submit(session["username"], name, command, func)
+    response = jsonify(command=command, job=job.id)
+    response.status_code = 202
+    return response
+
+def conditional(response, asset):
+    """
+    add the asset validators to response, turning it into a 304 when the client copy is current
+    """
+    response.set_etag(asset.etag)
+    response.last_modified = asset.mtime
+    if request.args.get('v') == asset.etag:
+        # versioned url: the content behind it never changes
+        response.cache_control.max_age = 31536000
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 # REST endpoints
 @app.route(API_V1 + "projects", methods=['GET'])
 def list_projects():
@@ -75,10 +122,21 @@ def list_projects():
         YML_PATH = "./users/" + session["username"]
 
         projects = load_projects(YML_PATH)
-        active = [container['Labels']['com.docker.compose.project'] \
-            if 'com.docker.compose.project' in container['Labels'] \
-            else [] for container in containers()]
-        return jsonify(projects=projects, active=active)
+        return jsonify(projects=projects, active=active_projects())
+    else:
+        return "unauthorized", 403
+
+@app.route(API_V1 + "overview", methods=['GET'])
+def overview():
+    """
+    state, container counts, services and readme/logo presence of a page of projects
+    """
+    if("username" in session):
+        YML_PATH = "./users/" + session["username"]
+
+        page = request.args.get('page', 0, type=int)
+        page_size = request.args.get('page_size', PAGE_SIZE, type=int)
+        return jsonify(projects_overview(load_projects(YML_PATH), max(page, 0), max(page_size, 1)))
     else:
         return "unauthorized", 403
 
@@ -106,7 +164,23 @@ def project_containers(name):
         YML_PATH = "./users/" + session["username"]
 
         project = get_project_with_name(YML_PATH, name)
-        return jsonify(containers=ps_(project))
+        index = get_index()
+        inspected = index.project_containers(project.name) if index is not None else None
+        return jsonify(containers=ps_(project, inspected))
+    else:
+        return "unauthorized", 403
+
+@app.route(API_V1 + "events/<name>", methods=['GET'])
+def project_events(name):
+    """
+    Server-Sent Events stream of the project containers state
+    """
+    if("username" in session):
+        YML_PATH = "./users/" + session["username"]
+
+        project = get_project_with_name(YML_PATH, name)
+        return Response(stream_with_context(watch_project(YML_PATH + '/' + name, project)),
+                        mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
     else:
         return "unauthorized", 403
 
@@ -168,7 +242,10 @@ def get_project_readme(name):
         YML_PATH = "./users/" + session["username"]
         projects = load_projects(YML_PATH)
         path = projects[name]
-        return jsonify(readme=get_readme_file(path))
+        asset = project_asset(path, README)
+        if asset is None:
+            return jsonify(readme=None)
+        return conditional(jsonify(readme=asset.content.decode('utf8')), asset)
     else:
         return "unauthorized", 403
 
@@ -181,14 +258,25 @@ def get_project_logo(name):
         YML_PATH = "./users/" + session["username"]
         projects = load_projects(YML_PATH)
         path = projects[name]
-        logo = get_logo_file(path)
-        if logo is None:
+        asset = project_asset(path, LOGO)
+        if asset is None:
             abort(404)
-        return logo
+        return conditional(Response(asset.content, mimetype='image/png'), asset)
     else:
         abort(403)
 
 
+@app.route(API_V1 + "assets", methods=['GET'])
+def projects_assets():
+    """
+    readme/logo metadata of all the projects
+    """
+    if("username" in session):
+        YML_PATH = "./users/" + session["username"]
+        return jsonify(assets=assets_metadata(load_projects(YML_PATH)))
+    else:
+        return "unauthorized", 403
+
 @app.route(API_V1 + "projects/<name>/<container_id>", methods=['GET'])
 def project_container(name, container_id):
     """
@@ -241,8 +329,8 @@ def pull():
     if("username" in session):
         YML_PATH = "./users/" + session["username"]
         name = loads(request.data)["id"]
-        get_project_with_name(YML_PATH, name).pull()
-        return jsonify(command='pull')
+        project = get_project_with_name(YML_PATH, name)
+        return queue_job(name, 'pull', project.pull)
     else:
         return "unauthorized", 403
 
@@ -256,13 +344,12 @@ def scale():
         YML_PATH = "./users/" + session["username"]
 
         req = loads(request.data)
-        name = request['project']
+        name = req['project']
         service_name = req['service']
         num = req['num']
 
-        project = get_project_with_name(YML_PATH, name)
-        project.get_service(service_name).scale(desired_num=int(num))
-        return jsonify(command='scale')
+        service = get_project_with_name(YML_PATH, name).get_service(service_name)
+        return queue_job(name, 'scale', lambda: service.scale(desired_num=int(num)))
     else:
         return "unauthorized", 403
 
@@ -278,19 +365,18 @@ def up_():
         req = loads(request.data)
         name = req["id"]
         service_names = req.get('service_names', None)
-        do_build = BuildAction.force if req.get('do_build', False) else BuildAction.none
-        
-        nUid = os.getuid()
-        os.environ["CURRENT_UID"] = str(nUid)
-        container_list = get_project_with_name(YML_PATH, name).up(
-            service_names=service_names,
-            do_build=do_build)
+        do_build = compose_service.BuildAction.force if req.get('do_build', False) \
+            else compose_service.BuildAction.none
 
-        return jsonify(
-            {
-                'command': 'up',
-                'containers': [container.name for container in container_list]
-            })
+        project = get_project_with_name(YML_PATH, name)
+
+        def up_job():
+            container_list = project.up(
+                service_names=service_names,
+                do_build=do_build)
+            return dict(containers=[container.name for container in container_list])
+
+        return queue_job(name, 'up', up_job)
     else:
         return "unauthorized", 403
 
@@ -309,9 +395,9 @@ def build():
         dic = dict(no_cache=json["no_cache"] if "no_cache" in json \
         else None, pull=json["pull"] if "pull" in json else None)
 
-        get_project_with_name(YML_PATH, name).build(**dic)
+        project = get_project_with_name(YML_PATH, name)
 
-        return jsonify(command='build')
+        return queue_job(name, 'build', lambda: project.build(**dic))
     else:
         return "unauthorized", 403
 
@@ -328,25 +414,36 @@ def create_project():
 
         data = loads(request.data)
         sName = data["name"]
-        file_path = git_clone(data["repoName"], YML_PATH + '/' +  sName)
+        try:
+            # None on first use: cloned directly while the mirror is made in the background
+            sMirror = cached_mirror(data["repoName"])
+        except Exception: # pylint: disable=broad-except
+            logging.exception('no mirror for ' + data["repoName"])
+            sMirror = None
+        file_path = git_clone(data["repoName"], YML_PATH + '/' +  sName, sMirror)
 
         if 'env' in data and data["env"]:
             env_file = open(YML_PATH + '/' + sName + "/.env", "w")
             env_file.write(data["env"])
             env_file.close()
 
-        with open('cloudflare.json') as json_data_file:
-            oCreds = loads(json_data_file.read())
+        sSite = cloudflare_site()
+        nPort = allocate_port(sName + "." + sSite)
+        sEnvPath = YML_PATH + '/' + sName + "/.env"
+        sEnv = ""
+        if os.path.isfile(sEnvPath):
+            with open(sEnvPath) as env_file:
+                sEnv = env_file.read()
+        if "RHPORT=" not in sEnv:
+            with open(sEnvPath, "a") as env_file:
+                env_file.write(("" if sEnv == "" or sEnv.endswith("\n") else "\n") + "RHPORT=" + str(nPort) + "\n")
 
-        dictToSend = {'type':"CNAME", 'name':sName, 'content': oCreds["Site"], 'proxied': True }
-        dictHeaders = {"X-Auth-Email":oCreds["EmailID"], "X-Auth-Key":oCreds["SecretKey"]}
-        res = requests.post('https://api.cloudflare.com/client/v4/zones/' + oCreds["ZoneID"] + "/dns_records", json=dictToSend, headers=dictHeaders)
-        print('response from server:',res.text)
+        queue_create(sName)
 
+        invalidate(YML_PATH)
+        update_upstream_map(sSite)
 
-        load_projects(YML_PATH)
-
-        return jsonify(path=file_path)
+        return jsonify(path=file_path, port=nPort)
     else:
         return "unauthorized", 403
 
@@ -366,6 +463,8 @@ def update_project():
             env_file.write(data["env"])
             env_file.close()
 
+        evict_project(YML_PATH + '/' + data["name"])
+        invalidate(YML_PATH)
         return jsonify(path=file_path)
     else:
         return "unauthorized", 403
@@ -381,24 +480,46 @@ def remove_project(name):
         YML_PATH = "./users/" + sUserName
         directory = YML_PATH + '/' + name
         rmtree(directory)
+        evict_project(directory)
 
-        with open('cloudflare.json') as json_data_file:
-            oCreds = loads(json_data_file.read())
-        dictHeaders = {"X-Auth-Email":oCreds["EmailID"], "X-Auth-Key":oCreds["SecretKey"]}
-        res = requests.get('https://api.cloudflare.com/client/v4/zones/' + oCreds["ZoneID"] + "/dns_records?name=" + name +  "." + oCreds["Site"], headers=dictHeaders)
-        dictFromServer = res.json()
-        if(len(dictFromServer["result"]) > 0):
-            sId = dictFromServer["result"][0]["id"]
-            res = requests.delete('https://api.cloudflare.com/client/v4/zones/' + oCreds["ZoneID"] + "/dns_records/" + sId, headers=dictHeaders)
-            print(res.text)
+        sSite = cloudflare_site()
+        queue_delete(name)
 
+        invalidate(YML_PATH)
+        release_port(name + "." + sSite)
+        update_upstream_map(sSite)
+        return jsonify(path=directory)
+    else:
+        return "unauthorized", 403
 
 
-        load_projects("./users/" + sUserName)
-        return jsonify(path=directory)
+@app.route(API_V1 + "git-sync", methods=['GET'])
+def git_sync_status():
+    """
+    last sync of the GIT_REPO checkout
+    """
+    if("username" in session):
+        return jsonify(git_sync_state())
     else:
         return "unauthorized", 403
 
+@app.route(API_V1 + "git-sync", methods=['POST'])
+def git_sync_webhook():
+    """
+    webhook: sync the GIT_REPO checkout now; enabled by GIT_WEBHOOK_SECRET and
+    authenticated with a GitHub style X-Hub-Signature-256 header
+    """
+    if not git_repo or not GIT_WEBHOOK_SECRET:
+        abort(404)
+    signature = 'sha256=' + hmac.new(GIT_WEBHOOK_SECRET.encode('utf-8'), request.get_data(),
+                                     hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, request.headers.get('X-Hub-Signature-256', '')):
+        abort(403)
+    start_git_refresh()
+    request_git_sync()
+    response = jsonify(git_sync_state())
+    response.status_code = 202
+    return response
 
 @app.route(API_V1 + "search", methods=['POST'])
 def search():
@@ -406,11 +527,10 @@ def search():
     search for a project on a docker-compose registry 
     """
     query = loads(request.data)['query']
-    response = requests.get(COMPOSE_REGISTRY + '/api/v1/search', \
-        params={'query': query}, headers={'x-key': 'default'})
-    result = jsonify(response.json())
-    if response.status_code != 200:
-        result.status_code = response.status_code
+    status_code, body = registry_search(query)
+    result = jsonify(body)
+    if status_code != 200:
+        result.status_code = status_code
     return result
 
 
@@ -420,9 +540,8 @@ def yml():
     get yml content from a docker-compose registry 
     """
     item_id = loads(request.data)['id']
-    response = requests.get(COMPOSE_REGISTRY + '/api/v1/yml', \
-        params={'id': item_id}, headers={'x-key': 'default'})
-    return jsonify(response.json())
+    _, body = registry_yml(item_id)
+    return jsonify(body)
 
 
 @app.route(API_V1 + "_create", methods=['POST'])
@@ -477,8 +596,8 @@ def down():
     if("username" in session):
         YML_PATH = "./users/" + session["username"]
         name = loads(request.data)["id"]
-        get_project_with_name(YML_PATH, name).down(ImageType.none, None)
-        return jsonify(command='down')
+        project = get_project_with_name(YML_PATH, name)
+        return queue_job(name, 'down', lambda: project.down(compose_service.ImageType.none, None))
     else:
         return "unauthorized", 403
 
@@ -491,8 +610,9 @@ def restart():
     if("username" in session):
         YML_PATH = "./users/" + session["username"]
         name = loads(request.data)["id"]
-        get_project_with_name(YML_PATH, name).restart()
-        return jsonify(command='restart')
+        project = get_project_with_name(YML_PATH, name)
+        return queue_job(name, 'restart', lambda: dict(
+            containers=[container.name for container in project.restart()]))
     else:
         return "unauthorized", 403
 
@@ -527,15 +647,87 @@ def container_logs(name, container_id, limit):
     else:
         return "unauthorized", 403
 
+def log_stream_options():
+    """
+    since, until, follow and tail query parameters of the log streams
+    """
+    since = request.args.get('since', type=int)
+    until = request.args.get('until', type=int)
+    follow = request.args.get('follow', 'false').lower() in ('1', 'true', 'yes')
+    tail = request.args.get('tail', 'all')
+    return dict(since=since, until=until, follow=follow, tail=int(tail) if tail.isdigit() else 'all')
+
+@app.route(API_V1 + "logs-stream/<name>", methods=['GET'])
+def logs_stream(name):
+    """
+    docker-compose logs as NDJSON, merged by timestamp
+    """
+    if("username" in session):
+        YML_PATH = "./users/" + session["username"]
+        container_list = get_project_with_name(YML_PATH, name).containers(stopped=True)
+        return Response(stream_with_context(stream_logs(container_list, **log_stream_options())),
+                        mimetype='application/x-ndjson')
+    else:
+        return "unauthorized", 403
+
+@app.route(API_V1 + "logs-stream/<name>/<container_id>", methods=['GET'])
+def container_logs_stream(name, container_id):
+    """
+    docker-compose logs of a specific container as NDJSON
+    """
+    if("username" in session):
+        YML_PATH = "./users/" + session["username"]
+        project = get_project_with_name(YML_PATH, name)
+        container = get_container_from_id(project.client, container_id)
+        return Response(stream_with_context(stream_logs([container], **log_stream_options())),
+                        mimetype='application/x-ndjson')
+    else:
+        return "unauthorized", 403
+
+@app.route(API_V1 + "jobs", methods=['GET'])
+def jobs():
+    """
+    jobs of the current user
+    """
+    if("username" in session):
+        return jsonify(jobs=list_jobs(session["username"]))
+    else:
+        return "unauthorized", 403
+
+@app.route(API_V1 + "jobs/<job_id>", methods=['GET'])
+def job_status(job_id):
+    """
+    job state and progress events
+    """
+    if("username" in session):
+        job = get_job(job_id)
+        if job is None or job['owner'] != session["username"]:
+            abort(404)
+        return jsonify(job)
+    else:
+        return "unauthorized", 403
+
+@app.route(API_V1 + "jobs/<job_id>", methods=['DELETE'])
+@requires_auth
+def cancel_job(job_id):
+    """
+    cancel a queued job
+    """
+    if("username" in session):
+        job = get_job(job_id)
+        if job is None or job['owner'] != session["username"]:
+            abort(404)
+        return jsonify(cancel(job_id))
+    else:
+        return "unauthorized", 403
+
 @app.route(API_V1 + "host", methods=['GET'])
 def host():
     """
     docker host info
     """
     if('username' in session):
-        host_value = os.getenv('DOCKER_HOST')
-
-        return jsonify(host=host_value, workdir="/" + session['username'] + "/")
+        return jsonify(host=current_host(), name=selected_host(), workdir="/" + session['username'] + "/")
 
     else:
         return "unauthorized", 403
@@ -564,22 +756,168 @@ def health():
     """
     docker health
     """
-    return jsonify(info())
+    return jsonify(daemon_info())
+
+@app.route(API_V1 + "health/live", methods=['GET'])
+def health_live():
+    """
+    liveness probe, never calls the docker daemon
+    """
+    return jsonify(liveness())
+
+@app.route(API_V1 + "health/ready", methods=['GET'])
+def health_ready():
+    """
+    readiness probe, backed by a short lived cached docker ping
+    """
+    ready, details = readiness()
+    response = jsonify(details)
+    if not ready:
+        response.status_code = 503
+    return response
+
+@app.route(API_V1 + "wake", methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'])
+def wake_project():
+    """
+    called by nginx when a project upstream does not answer: start the
+    project and send the client back to the url it asked for
+    """
+    if wake(request.host):
+        return redirect(request.headers.get('X-Original-URI', '/'), code=307)
+    response = Response('<html><head><meta http-equiv="refresh" content="5"></head>'
+                        '<body>starting ' + request.host.split(':')[0] + ', please wait...</body></html>',
+                        status=503, mimetype='text/html')
+    response.headers['Retry-After'] = '5'
+    return response
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    """
+    prometheus metrics of all the workers
+    """
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_request_timer():
+    """
+    remember when the request started, for the latency metrics
+    """
+    g.request_started = time()
+
+@app.before_request
+def select_docker_host():
+    """
+    talk to the docker host of the user for the rest of the request
+    """
+    select_host(host_for(session["username"]) if "username" in session else None)
+
+@app.teardown_request
+def release_docker_host(exc=None): # pylint: disable=unused-argument
+    """
+    the thread serves other users next
+    """
+    select_host(None)
+
+@app.after_request
+def count_request(response):
+    """
+    request count and latency per route
+    """
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        observe('http_request_duration_seconds', time() - started, route=route)
+    return response
+
+@app.before_first_request
+def start_background_tasks():
+    """
+    run the startup phase of this worker, if the server did not already
+    """
+    startup()
 
 @app.route(API_V1 + "host", methods=['POST'])
 @requires_auth
 def set_host():
     """
-    set docker host
-    """
-    new_host = loads(request.data)["id"]
+    bind the user, or one of its projects, to a registered docker host given by
+    name or url; without a user, an administrator sets the default docker host
+    """
+    req = loads(request.data)
+    new_host = req["id"]
+    if "username" not in session:
+        if not is_admin():
+            return "forbidden", 403
+        if new_host is None:
+            remove_host(DEFAULT_HOST)
+        else:
+            add_host(DEFAULT_HOST, hosts().get(new_host, new_host))
+            new_host = DEFAULT_HOST
+    else:
+        if new_host is not None and new_host not in hosts():
+            # only administrators register hosts, see put_host
+            new_host = name_of(new_host)
+            if new_host is None:
+                return "unknown docker host", 404
+        bind(session["username"], new_host, req.get("project"))
+
     if new_host is None:
-        if 'DOCKER_HOST' in os.environ:
-            del os.environ['DOCKER_HOST']
         return jsonify()
+    return jsonify(host=hosts()[new_host], name=new_host)
+
+@app.route(API_V1 + "hosts", methods=['GET'])
+def list_hosts():
+    """
+    docker hosts and the bindings of the user
+    """
+    if("username" in session):
+        return jsonify(hosts=hosts(), bindings=bindings(session["username"]), default=DEFAULT_HOST)
     else:
-        os.environ['DOCKER_HOST'] = new_host
-        return jsonify(host=new_host)
+        return "unauthorized", 403
+
+@app.route(API_V1 + "hosts", methods=['PUT'])
+@requires_auth
+@requires_admin
+def put_host():
+    """
+    register a docker host under a name
+    """
+    req = loads(request.data)
+    add_host(req["name"], req["url"])
+    return jsonify(hosts=hosts())
+
+@app.route(API_V1 + "hosts/<name>", methods=['DELETE'])
+@requires_auth
+@requires_admin
+def delete_host(name):
+    """
+    forget a docker host, what was bound to it goes back to the default one
+    """
+    url = hosts().get(name)
+    remove_host(name)
+    if url not in hosts().values():
+        forget_index(url)
+        reset_clients(url)
+    return jsonify(hosts=hosts())
+
+@app.route(API_V1 + "hosts/health", methods=['GET'])
+def hosts_health():
+    """
+    readiness of every docker host, pinged concurrently
+    """
+    ready, details = readiness_all()
+    response = jsonify(details)
+    if not ready:
+        response.status_code = 503
+    return response
+
+@app.route(API_V1 + "hosts/containers", methods=['GET'])
+def hosts_containers():
+    """
+    running and total compose containers of every docker host
+    """
+    return jsonify(container_counts())
 
 @app.route(API_V1 + "authentication", methods=['GET'])
 def authentication():
@@ -649,25 +987,16 @@ def login():
 
 ## basic exception handling
 
-@app.errorhandler(requests.exceptions.ConnectionError)
-def handle_connection_error(err):
-    """
-    connection exception handler
-    """
-    return 'docker host not found: ' + str(err), 500
-
-@app.errorhandler(docker.errors.DockerException)
-def handle_docker_error(err):
-    """
-    docker exception handler
-    """
-    return 'docker exception: ' + str(err), 500
-
 @app.errorhandler(Exception)
 def handle_generic_error(err):
     """
-    default exception handler
+    default exception handler; requests and docker errors are told apart
+    without importing those modules
     """
+    if is_instance(err, 'requests.exceptions', 'ConnectionError'):
+        return 'docker host not found: ' + str(err), 500
+    if is_instance(err, 'docker.errors', 'DockerException'):
+        return 'docker exception: ' + str(err), 500
     traceback.print_exc()
     return 'error: ' + str(err), 500
 
@@ -0,0 +1,86 @@
+"""
+cached project assets (README.md, logo.png) with validators for conditional GETs
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from scripts.metrics import cache_hit, cache_miss
+
+ASSET_CACHE_BYTES = int(os.getenv('ASSET_CACHE_BYTES', str(32 * 1024 * 1024)))
+README = 'readme.md'
+LOGO = 'logo.png'
+
+Asset = namedtuple('Asset', ['content', 'etag', 'mtime', 'size'])
+
+_lock = threading.Lock()
+_listings = {}
+_contents = OrderedDict()
+_contents_size = [0]
+
+
+def _find(path, lower_name):
+    """
+    case insensitive lookup of a file in path, the listing is cached by folder mtime
+    """
+    folder = os.path.normpath(path)
+    mtime = os.stat(folder).st_mtime_ns
+    with _lock:
+        listing = _listings.get(folder)
+    if listing is None or listing[0] != mtime:
+        names = dict((name.lower(), name) for name in os.listdir(folder)
+                     if os.path.isfile(os.path.join(folder, name)))
+        listing = (mtime, names)
+        with _lock:
+            _listings[folder] = listing
+    name = listing[1].get(lower_name)
+    return os.path.join(folder, name) if name else None
+
+def _read(file_path):
+    """
+    content of file_path, from the LRU cache while its mtime and size are unchanged
+    """
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        asset = _contents.get(key)
+        if asset is not None:
+            _contents.move_to_end(key)
+            cache_hit('assets')
+            return asset
+
+    cache_miss('assets')
+    with open(file_path, 'rb') as asset_file:
+        content = asset_file.read()
+    asset = Asset(content, hashlib.md5(content).hexdigest(), int(stat.st_mtime), len(content))
+
+    if len(content) <= ASSET_CACHE_BYTES:
+        with _lock:
+            if key not in _contents:
+                _contents[key] = asset
+                _contents_size[0] += asset.size
+            while _contents_size[0] > ASSET_CACHE_BYTES:
+                _, evicted = _contents.popitem(last=False)
+                _contents_size[0] -= evicted.size
+    return asset
+
+def project_asset(path, lower_name):
+    """
+    Asset for the file named lower_name (case insensitive) in path, None if missing
+    """
+    file_path = _find(path, lower_name)
+    return _read(file_path) if file_path else None
+
+def assets_metadata(projects):
+    """
+    readme/logo presence, etag and size of every project of a name -> path dict
+    """
+    metadata = {}
+    for name, path in projects.items():
+        entry = {}
+        for key, lower_name in (('readme', README), ('logo', LOGO)):
+            asset = project_asset(path, lower_name)
+            entry[key] = dict(etag=asset.etag, size=asset.size, mtime=asset.mtime) if asset else None
+        metadata[name] = entry
+    return metadata
@@ -3,26 +3,45 @@ bridge to docker-compose
 """
 
 import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from os.path import normpath
-from compose import __version__ as compose_version
-from compose.container import Container
-from compose.cli.utils import get_version_info
-from compose.cli.command import get_project as compose_get_project, get_config_path_from_options, get_config_from_options
-from compose.config.config import get_default_config_files
-from compose.config.environment import Environment
+from scripts.client_pool import get_client, install as install_client_pool
+from scripts.docker_hosts import current_host
+from scripts.lazy import lazy_import
+from scripts.metrics import cache_hit, cache_miss
 
-from compose.cli.docker_client import docker_client
-from compose.const import API_VERSIONS, COMPOSEFILE_V3_0
+compose = lazy_import('compose')
+compose_container = lazy_import('compose.container')
+compose_command = lazy_import('compose.cli.command')
+compose_config = lazy_import('compose.config.config')
+compose_environment = lazy_import('compose.config.environment')
+compose_const = lazy_import('compose.const')
 
+PS_WORKERS = int(os.getenv('PS_WORKERS', '8'))
+PROJECT_CACHE_SIZE = int(os.getenv('PROJECT_CACHE_SIZE', '64'))
+PROJECT_FILES = ('.env', 'docker-compose.yml', 'docker-compose.yaml',
+                 'docker-compose.override.yml', 'docker-compose.override.yaml')
 
-logging.info(get_version_info('full'))
+_project_cache = OrderedDict()
+_project_cache_lock = threading.Lock()
 
-def ps_(project):
+def ps_(project, inspected=None):
     """
-    containers status
+    containers status, built from the given inspect data when available
     """
     logging.info('ps ' + project.name)
-    running_containers = project.containers(stopped=True)
+    if inspected is None:
+        # same listing as project.containers(stopped=True), without its serial inspects
+        listed = project.client.containers(all=True, filters={'label': project.labels()})
+        container_list = inspect_all([compose_container.Container.from_ps(project.client, item) for item in listed])
+    else:
+        container_list = [compose_container.Container(project.client, item, has_been_inspected=True)
+                          for item in inspected]
+    running_containers = [container for container in container_list
+                          if container.service in project.service_names]
 
     items = [{
         'name': container.name,
@@ -31,17 +50,32 @@ def ps_(project):
         'state': container.human_readable_state,
         'labels': container.labels,
         'ports': container.ports,
-        'volumes': get_volumes(get_container_from_id(project.client, container.id)),
+        'volumes': get_volumes(container),
         'is_running': container.is_running} for container in running_containers]
 
     return items
 
 
+def inspect_all(container_list):
+    """
+    inspect the given containers concurrently, at most PS_WORKERS at a time
+    """
+    pending = [container for container in container_list if not container.has_been_inspected]
+    if len(pending) < 2:
+        for container in pending:
+            container.inspect()
+        return container_list
+
+    with ThreadPoolExecutor(max_workers=min(PS_WORKERS, len(pending))) as executor:
+        list(executor.map(lambda container: container.inspect(), pending))
+    return container_list
+
+
 def get_container_from_id(my_docker_client, container_id):
     """
     return the docker container from a given id
     """
-    return Container.from_id(my_docker_client, container_id)
+    return compose_container.Container.from_id(my_docker_client, container_id)
 
 def get_volumes(container):
     """
@@ -55,18 +89,66 @@ def get_yml_path(path):
     """
     get path of docker-compose.yml file
     """
-    return get_default_config_files(path)[0]
+    return compose_config.get_default_config_files(path)[0]
 
-def get_project(path):
+def _files_signature(path):
     """
-    get docker project given file path
+    (name, mtime, size) of the files a compose project is built from
+    """
+    signature = []
+    for name in PROJECT_FILES:
+        try:
+            stat = os.stat(os.path.join(path, name))
+            signature.append((name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            pass
+    return tuple(signature)
+
+def _cached(kind, path, build):
+    """
+    LRU cache of objects parsed from the compose files in path
+    """
+    folder = normpath(path)
+    # compose interpolates the process environment into the parsed files
+    key = (kind, folder, _files_signature(folder), current_host(), frozenset(os.environ.items()))
+
+    with _project_cache_lock:
+        if key in _project_cache:
+            _project_cache.move_to_end(key)
+            cache_hit(kind)
+            return _project_cache[key]
+
+    cache_miss(kind)
+    value = build()
+
+    with _project_cache_lock:
+        _project_cache[key] = value
+        while len(_project_cache) > PROJECT_CACHE_SIZE:
+            _project_cache.popitem(last=False)
+    return value
+
+def evict_project(path):
+    """
+    drop every cached object parsed from the compose files in path
     """
+    folder = normpath(path)
+    with _project_cache_lock:
+        for key in [key for key in _project_cache if key[1] == folder]:
+            del _project_cache[key]
+
+def _load_project(path):
     logging.debug('get project ' + path)
 
-    environment = Environment.from_env_file(path)
-    config_path = get_config_path_from_options(path, dict(), environment)
-    project = compose_get_project(path, config_path)
-    return project
+    install_client_pool()
+    environment = compose_environment.Environment.from_env_file(path)
+    config_path = compose_command.get_config_path_from_options(path, dict(), environment)
+    return compose_command.get_project(path, config_path, host=current_host())
+
+def get_project(path):
+    """
+    get docker project given file path
+    """
+    return _cached('project', path, lambda: _load_project(path))
 
 def containers():
     """
@@ -74,22 +156,24 @@ def containers():
     """
     return client().containers()
 
-def info():
+def info(docker_info=None):
     """
     docker info
     """
-    docker_info = client().info()
-    return dict(compose=compose_version,info=docker_info['ServerVersion'], name=docker_info['Name'])
+    docker_info = docker_info or client().info()
+    return dict(compose=compose.__version__,info=docker_info['ServerVersion'], name=docker_info['Name'])
 
-def client():
+def client(host=None):
     """
-    docker client
+    docker client of host, by default the one selected by the current thread
     """
-    return docker_client(Environment(), API_VERSIONS[COMPOSEFILE_V3_0])
+    return get_client(compose_environment.Environment(),
+                      version=compose_const.API_VERSIONS[compose_const.COMPOSEFILE_V3_0],
+                      host=host or current_host())
 
 def project_config(path):
     """
     docker-compose config
     """
     norm_path = normpath(path)
-    return get_config_from_options(norm_path, dict())
+    return _cached('config', norm_path, lambda: compose_command.get_config_from_options(norm_path, dict()))
@@ -0,0 +1,143 @@
+"""
+process wide pool of docker API clients
+"""
+
+import logging
+import os
+import re
+import threading
+from time import time
+from scripts.lazy import lazy_import, import_module
+from scripts.metrics import inc, observe
+
+compose_command = lazy_import('compose.cli.command')
+requests_adapters = lazy_import('requests.adapters')
+
+DOCKER_POOL_SIZE = int(os.getenv('DOCKER_POOL_SIZE', '10'))
+# API objects whose id or name follows in the path, e.g. /containers/{id}/json
+DOCKER_OBJECTS = ('containers', 'images', 'networks', 'volumes', 'exec', 'services', 'tasks',
+                  'nodes', 'secrets', 'configs', 'plugins', 'distribution')
+COLLECTION_ACTIONS = ('json', 'create', 'prune', 'load', 'search', 'get', 'build', 'pull')
+OBJECT_ACTIONS = ('json', 'start', 'stop', 'restart', 'kill', 'wait', 'logs', 'top', 'stats', 'changes',
+                  'export', 'attach', 'resize', 'update', 'rename', 'pause', 'unpause', 'exec', 'archive',
+                  'history', 'push', 'tag', 'get', 'connect', 'disconnect', 'enable', 'disable')
+
+_API_VERSION = re.compile(r'^v[0-9.]+$')
+
+_compose = {}
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = None
+
+
+def _compose_get_client(*args, **kwargs):
+    """
+    compose's own get_client, also once install() replaced it
+    """
+    return _compose.get('get_client', compose_command.get_client)(*args, **kwargs)
+
+def _endpoint(path):
+    """
+    path of a docker API call without version, query and object ids
+    """
+    parts = [part for part in path.split('?')[0].split('/') if part]
+    if parts and _API_VERSION.match(parts[0]):
+        parts = parts[1:]
+    if len(parts) >= 2 and parts[0] in DOCKER_OBJECTS and parts[1] not in COLLECTION_ACTIONS:
+        # image names may contain slashes, keep only the action after them
+        action = parts[-1:] if len(parts) > 2 and parts[-1] in OBJECT_ACTIONS else []
+        parts = [parts[0], '{id}'] + action
+    return '/' + '/'.join(parts)
+
+def _instrument(docker_client):
+    """
+    count and time every API call made through a docker client
+    """
+    send = docker_client.send
+
+    def timed_send(prepared, **kwargs):
+        endpoint = _endpoint(prepared.path_url)
+        started = time()
+        try:
+            response = send(prepared, **kwargs)
+        except Exception:
+            inc('docker_api_requests_total', method=prepared.method, endpoint=endpoint, status='error')
+            raise
+        finally:
+            observe('docker_api_request_duration_seconds', time() - started,
+                    method=prepared.method, endpoint=endpoint)
+        inc('docker_api_requests_total', method=prepared.method, endpoint=endpoint, status=response.status_code)
+        return response
+
+    docker_client.send = timed_send
+    return docker_client
+
+def _tune_pool(docker_client):
+    """
+    size the keep-alive connection pool of a docker client
+    """
+    # docker is loaded by now, the adapter module only adds the pooled subclass
+    from scripts.unix_adapter import PooledUnixAdapter, UnixAdapter # pylint: disable=import-outside-toplevel
+
+    adapter = getattr(docker_client, '_custom_adapter', None)
+    if isinstance(adapter, UnixAdapter):
+        adapter = PooledUnixAdapter(adapter.socket_path, adapter.timeout, DOCKER_POOL_SIZE)
+        docker_client._custom_adapter = adapter
+        docker_client.mount('http+docker://', adapter)
+    elif adapter is None and docker_client.base_url.startswith('http://'):
+        docker_client.mount('http://', requests_adapters.HTTPAdapter(pool_maxsize=DOCKER_POOL_SIZE))
+    return docker_client
+
+def _client_key(environment, version, host):
+    environment = environment or os.environ
+    return (host or environment.get('DOCKER_HOST'),
+            environment.get('DOCKER_TLS_VERIFY'),
+            environment.get('DOCKER_CERT_PATH'),
+            environment.get('COMPOSE_HTTP_TIMEOUT'),
+            version)
+
+def get_client(environment, verbose=False, version=None, tls_config=None, host=None,
+               tls_version=None):
+    """
+    shared docker client for (DOCKER_HOST, api version), built on first use
+    """
+    global _clients_pid # pylint: disable=global-statement
+
+    if tls_config is not None or verbose:
+        return _instrument(_compose_get_client(environment, verbose, version, tls_config, host, tls_version))
+
+    key = _client_key(environment, version, host)
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            # connections opened before a fork must not be shared with the parent
+            _clients.clear()
+            _clients_pid = os.getpid()
+
+        client = _clients.get(key)
+        if client is None:
+            logging.debug('new docker client for %s', key)
+            client = _instrument(_tune_pool(_compose_get_client(environment, version=version, host=host,
+                                                                tls_version=tls_version)))
+            _clients[key] = client
+    return client
+
+def reset_clients(host=None):
+    """
+    close and forget the pooled clients of DOCKER_HOST url host, e.g. once it
+    has been removed; every pooled client by default
+    """
+    with _clients_lock:
+        stale = [_clients.pop(key) for key in list(_clients) if host is None or key[0] == host]
+    for client in stale:
+        client.close()
+
+def install():
+    """
+    make compose build projects on top of the pooled clients
+    """
+    command = import_module('compose.cli.command')
+
+    with _clients_lock:
+        if command.get_client is not get_client:
+            _compose['get_client'] = command.get_client
+            command.get_client = get_client
@@ -0,0 +1,274 @@
+"""
+Cloudflare DNS records of the projects
+
+record changes are queued and applied by a background worker, in batches,
+through a persistent HTTP session, with exponential backoff on failure.
+Changes not applied yet are kept in DNS_PENDING, so that a restarted worker
+applies them again. A periodic reconcile pass retries them and creates the
+records missing for projects on disk.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from json import dumps, loads
+from queue import Queue, Empty
+from time import sleep, time
+from scripts.lazy import lazy_import
+from scripts.project_registry import get_projects
+
+requests = lazy_import('requests')
+
+CLOUDFLARE_CONFIG = os.getenv('CLOUDFLARE_CONFIG', 'cloudflare.json')
+CLOUDFLARE_API = os.getenv('CLOUDFLARE_API', 'https://api.cloudflare.com/client/v4')
+DNS_BATCH_SIZE = int(os.getenv('DNS_BATCH_SIZE', '100'))
+DNS_BATCH_WINDOW = float(os.getenv('DNS_BATCH_WINDOW', '1'))
+DNS_MAX_RETRIES = int(os.getenv('DNS_MAX_RETRIES', '6'))
+DNS_RECONCILE_INTERVAL = float(os.getenv('DNS_RECONCILE_INTERVAL', '3600'))
+DNS_PENDING = os.getenv('DNS_PENDING', './dns-pending.json')
+DNS_TIMEOUT = 30
+PAGE_SIZE = 1000
+
+CREATE = 'create'
+DELETE = 'delete'
+
+_lock = threading.Lock()
+_config = {}
+_session = None
+_queue = None
+_worker_pid = None
+
+
+def load_config():
+    """
+    cloudflare.json, read again only when it changed on disk
+    """
+    mtime = os.path.getmtime(CLOUDFLARE_CONFIG)
+    with _lock:
+        if _config.get('mtime') != mtime:
+            with open(CLOUDFLARE_CONFIG) as json_data_file:
+                _config['creds'] = loads(json_data_file.read())
+            _config['mtime'] = mtime
+        return _config['creds']
+
+def cloudflare_site():
+    """
+    domain the project hostnames are created under
+    """
+    return load_config()["Site"]
+
+def _get_session():
+    global _session # pylint: disable=global-statement
+
+    creds = load_config()
+    with _lock:
+        if _session is None or _session.creds is not creds:
+            _session = requests.Session()
+            _session.creds = creds
+            _session.headers.update({"X-Auth-Email": creds["EmailID"], "X-Auth-Key": creds["SecretKey"]})
+        return _session
+
+def _zone_url(path):
+    return CLOUDFLARE_API + '/zones/' + load_config()["ZoneID"] + path
+
+def _check(res):
+    res.raise_for_status()
+    body = res.json()
+    if not body.get('success', False):
+        raise requests.HTTPError('cloudflare error: ' + str(body.get('errors')), response=res)
+    return body
+
+def list_records():
+    """
+    full name -> record id of the CNAME records pointing at the site
+    """
+    session = _get_session()
+    records = {}
+    page = 1
+    while True:
+        body = _check(session.get(_zone_url('/dns_records'), timeout=DNS_TIMEOUT, params={
+            'type': 'CNAME', 'content': cloudflare_site(), 'per_page': PAGE_SIZE, 'page': page}))
+        records.update((record['name'], record['id']) for record in body['result'])
+        info = body.get('result_info') or {}
+        if page >= info.get('total_pages', 1):
+            return records
+        page += 1
+
+def apply_changes(changes):
+    """
+    apply a name -> CREATE/DELETE dict in one batch request
+    """
+    site = cloudflare_site()
+    existing = list_records()
+    posts = [{'type': "CNAME", 'name': name, 'content': site, 'proxied': True}
+             for name, action in sorted(changes.items())
+             if action == CREATE and name + '.' + site not in existing]
+    deletes = [{'id': existing[name + '.' + site]}
+               for name, action in sorted(changes.items())
+               if action == DELETE and name + '.' + site in existing]
+    if not posts and not deletes:
+        return
+
+    logging.info('dns batch: %d creates, %d deletes', len(posts), len(deletes))
+    _check(_get_session().post(_zone_url('/dns_records/batch'), timeout=DNS_TIMEOUT,
+                               json={'posts': posts, 'deletes': deletes}))
+
+@contextmanager
+def _locked_pending():
+    """
+    the name -> CREATE/DELETE changes not applied yet, locked against other
+    processes and saved back if modified
+    """
+    with open(DNS_PENDING + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(DNS_PENDING) as pending_file:
+                pending = loads(pending_file.read())
+        except (IOError, ValueError):
+            pending = {}
+        original = dict(pending)
+        yield pending
+        if pending != original:
+            tmp_path = DNS_PENDING + '.' + str(os.getpid())
+            with open(tmp_path, 'w') as pending_file:
+                pending_file.write(dumps(pending, indent=1, sort_keys=True))
+            os.replace(tmp_path, DNS_PENDING)
+
+def _applied(changes):
+    """
+    forget the pending changes that were applied, unless a newer one replaced them
+    """
+    with _locked_pending() as pending:
+        for name, action in changes.items():
+            if pending.get(name) == action:
+                del pending[name]
+
+def _apply_with_retries(changes):
+    for attempt in range(DNS_MAX_RETRIES + 1):
+        try:
+            apply_changes(changes)
+            _applied(changes)
+            return True
+        except Exception: # pylint: disable=broad-except
+            if attempt == DNS_MAX_RETRIES:
+                # still pending: retried by the next reconcile pass
+                logging.exception('dns batch failed, giving up on %s for now', sorted(changes))
+                return False
+            delay = 2 ** attempt
+            logging.warning('dns batch failed, retrying in %ds', delay, exc_info=True)
+            sleep(delay)
+
+def _next_batch(queue, timeout):
+    """
+    wait for a change, then collect the ones arriving within DNS_BATCH_WINDOW;
+    returns the changes and the number of queue items they were merged from
+    """
+    changes = {}
+    name, action = queue.get(timeout=timeout)
+    changes[name] = action
+    count = 1
+    deadline = time() + DNS_BATCH_WINDOW
+    while len(changes) < DNS_BATCH_SIZE:
+        try:
+            name, action = queue.get(timeout=max(0, deadline - time()))
+        except Empty:
+            break
+        # the last change queued for a name wins
+        changes[name] = action
+        count += 1
+    return changes, count
+
+def _worker(queue):
+    reconciling = DNS_RECONCILE_INTERVAL > 0
+    next_reconcile = time() + DNS_RECONCILE_INTERVAL
+    while True:
+        try:
+            changes, count = _next_batch(queue, max(0.1, next_reconcile - time()) if reconciling else None)
+        except Empty:
+            changes, count = None, 0
+        if changes:
+            try:
+                _apply_with_retries(changes)
+            finally:
+                for _ in range(count):
+                    queue.task_done()
+        if reconciling and time() >= next_reconcile:
+            next_reconcile = time() + DNS_RECONCILE_INTERVAL
+            try:
+                reconcile()
+            except Exception: # pylint: disable=broad-except
+                logging.exception('dns reconcile failed')
+
+def _get_queue():
+    global _queue, _worker_pid # pylint: disable=global-statement
+
+    with _lock:
+        if _worker_pid != os.getpid():
+            _queue = Queue()
+            _worker_pid = os.getpid()
+            # changes left by a worker that exited before applying them
+            with _locked_pending() as pending:
+                for name, action in sorted(pending.items()):
+                    _queue.put((name, action))
+            thread = threading.Thread(target=_worker, args=(_queue,), name='dns-sync')
+            thread.daemon = True
+            thread.start()
+        return _queue
+
+def _queue_change(name, action):
+    queue = _get_queue()
+    with _locked_pending() as pending:
+        pending[name] = action
+    queue.put((name, action))
+
+def queue_create(name):
+    """
+    create the CNAME record of project name in the background
+    """
+    _queue_change(name, CREATE)
+
+def queue_delete(name):
+    """
+    delete the CNAME record of project name in the background
+    """
+    _queue_change(name, DELETE)
+
+def flush():
+    """
+    wait until every queued change has been applied or given up
+    """
+    _get_queue().join()
+
+def reconcile(users_path='./users'):
+    """
+    apply the pending changes, then create the records missing for the projects on disk
+
+    other stale records are only logged: the zone also holds records that were
+    not created by docker-compose-ui (www, apps, ...)
+    """
+    with open(CLOUDFLARE_CONFIG + '.lock', 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            return # another worker is reconciling
+        with _locked_pending() as pending:
+            changes = dict(pending)
+        if changes:
+            _apply_with_retries(changes)
+
+        site = cloudflare_site()
+        desired = set()
+        for user in os.listdir(users_path):
+            folder = os.path.join(users_path, user)
+            if os.path.isdir(folder):
+                desired.update(get_projects(folder))
+        existing = set(name[:-len('.' + site)] for name in list_records() if name.endswith('.' + site))
+
+        missing = desired - existing
+        if missing:
+            _apply_with_retries(dict((name, CREATE) for name in missing))
+        stale = existing - desired
+        if stale:
+            logging.info('dns records without project: %s', sorted(stale))
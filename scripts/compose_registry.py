@@ -0,0 +1,138 @@
+"""
+cached client of the docker-compose registry (DOCKER_COMPOSE_REGISTRY)
+
+answers are kept in a TTL + LRU cache, identical concurrent queries share a
+single upstream request and an expired answer is still served for a while
+(stale-while-revalidate) while it is refreshed in the background
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from time import time
+from scripts.lazy import lazy_import
+from scripts.metrics import cache_hit, cache_miss
+
+requests = lazy_import('requests')
+
+COMPOSE_REGISTRY = os.getenv('DOCKER_COMPOSE_REGISTRY')
+REGISTRY_CACHE_SIZE = int(os.getenv('REGISTRY_CACHE_SIZE', '256'))
+REGISTRY_CACHE_TTL = float(os.getenv('REGISTRY_CACHE_TTL', '60'))
+REGISTRY_STALE_TTL = float(os.getenv('REGISTRY_STALE_TTL', '600'))
+# (connect, read) timeouts in seconds
+REGISTRY_TIMEOUT = (3.05, float(os.getenv('REGISTRY_TIMEOUT', '10')))
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_in_flight = {}
+_session = None
+
+
+class _Flight(object):
+    """
+    an upstream request other callers can wait for
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _get_session():
+    global _session # pylint: disable=global-statement
+
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update({'x-key': 'default'})
+        return _session
+
+def _fetch(path, params):
+    response = _get_session().get(COMPOSE_REGISTRY + path, params=params, timeout=REGISTRY_TIMEOUT)
+    return response.status_code, response.json()
+
+def _store(key, result):
+    with _lock:
+        _cache[key] = (time(), result)
+        _cache.move_to_end(key)
+        while len(_cache) > REGISTRY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _single_flight(key, path, params):
+    """
+    fetch path, sharing the request with concurrent callers asking for the same key
+    """
+    with _lock:
+        flight = _in_flight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[key] = _Flight()
+
+    if leader:
+        try:
+            flight.result = _fetch(path, params)
+            if flight.result[0] == 200:
+                _store(key, flight.result)
+        except Exception as err: # pylint: disable=broad-except
+            flight.error = err
+        finally:
+            with _lock:
+                del _in_flight[key]
+            flight.done.set()
+    else:
+        flight.done.wait()
+
+    if flight.error is not None:
+        raise flight.error
+    return flight.result
+
+def _revalidate(key, path, params):
+    def refresh():
+        try:
+            _single_flight(key, path, params)
+        except Exception: # pylint: disable=broad-except
+            logging.exception('compose registry refresh failed: ' + path)
+
+    with _lock:
+        if key in _in_flight:
+            return
+    thread = threading.Thread(target=refresh, name='registry-refresh')
+    thread.daemon = True
+    thread.start()
+
+def registry_get(path, params):
+    """
+    (status code, json) of a GET on the registry
+    """
+    key = (path, tuple(sorted(params.items())))
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+
+    if entry is not None:
+        age = time() - entry[0]
+        if age < REGISTRY_CACHE_TTL:
+            cache_hit('compose_registry')
+            return entry[1]
+        if age < REGISTRY_CACHE_TTL + REGISTRY_STALE_TTL:
+            cache_hit('compose_registry')
+            _revalidate(key, path, params)
+            return entry[1]
+
+    cache_miss('compose_registry')
+    return _single_flight(key, path, params)
+
+def search(query):
+    """
+    search projects on the registry
+    """
+    return registry_get('/api/v1/search', {'query': query})
+
+def yml(item_id):
+    """
+    yml of a registry project
+    """
+    return registry_get('/api/v1/yml', {'id': item_id})
@@ -0,0 +1,220 @@
+"""
+in-memory container index fed by the docker events stream
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from scripts.bridge import client, PS_WORKERS
+from scripts.client_pool import reset_clients
+from scripts.docker_hosts import current_host, hosts
+from scripts.lazy import lazy_import
+
+docker_errors = lazy_import('docker.errors')
+
+RECONNECT_DELAY = float(os.getenv('EVENTS_RECONNECT_DELAY', '5'))
+LABEL_PROJECT = 'com.docker.compose.project'
+LABEL_SERVICE = 'com.docker.compose.service'
+LABEL_ONE_OFF = 'com.docker.compose.oneoff'
+# container events that do not change what the index holds
+IGNORED_ACTIONS = ('exec_', 'attach', 'resize', 'top', 'archive-path', 'export', 'commit', 'copy')
+
+_lock = threading.Lock()
+_indexes = {}
+_indexes_pid = None
+_listeners = []
+
+
+def _labels(container):
+    return container.get('Config', {}).get('Labels') or {}
+
+def _is_running(container):
+    return container.get('State', {}).get('Running', False)
+
+def _notify(project_name):
+    """
+    tell the listeners that containers of project_name (None: any project) changed
+    """
+    for listener in list(_listeners):
+        try:
+            listener(project_name)
+        except Exception: # pylint: disable=broad-except
+            logging.exception('container state listener failed')
+
+def add_listener(listener):
+    """
+    call listener(project_name) after every change of the index
+    """
+    _listeners.append(listener)
+
+def remove_listener(listener):
+    """
+    stop calling listener
+    """
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+class ContainerIndex(object):
+    """
+    inspect data of every container of a docker host, kept up to date by events
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.lock = threading.Lock()
+        self.containers = {}
+        self.info = None
+        self.synced = False
+        self.stopped = False
+        self.stream = None
+
+    def start(self):
+        """
+        start watching the docker host in a background thread
+        """
+        thread = threading.Thread(target=self._run, name='container-events')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        """
+        stop watching the docker host
+        """
+        self.stopped = True
+        self.synced = False
+        close = getattr(self.stream, 'close', None)
+        if close is not None:
+            close()
+
+    def _run(self):
+        while not self.stopped:
+            try:
+                self._watch()
+            except Exception: # pylint: disable=broad-except
+                if not self.stopped:
+                    logging.exception('docker events stream failed')
+            self.synced = False
+            if not self.stopped and self.host not in hosts().values():
+                # removed, possibly through another worker: stop reconnecting
+                forget_index(self.host)
+                reset_clients(self.host)
+            if not self.stopped:
+                sleep(RECONNECT_DELAY)
+
+    def _watch(self):
+        api = client(self.host)
+        # subscribe before listing so that no change is lost during the resync
+        self.stream = api.events(decode=True, filters={'type': 'container'})
+        self._resync(api)
+        for event in self.stream:
+            if self.stopped:
+                break
+            self._apply(api, event)
+
+    def _resync(self, api):
+        """
+        rebuild the whole index from a full container list
+        """
+        ids = [item['Id'] for item in api.containers(all=True)]
+
+        def inspect(container_id):
+            try:
+                return api.inspect_container(container_id)
+            except docker_errors.NotFound:
+                return None
+
+        with ThreadPoolExecutor(max_workers=PS_WORKERS) as executor:
+            inspected = [item for item in executor.map(inspect, ids) if item is not None]
+        docker_info = api.info()
+
+        with self.lock:
+            self.containers = dict((item['Id'], item) for item in inspected)
+            self.info = docker_info
+            self.synced = True
+        logging.info('container index synced: %d containers', len(inspected))
+        _notify(None)
+
+    def _apply(self, api, event):
+        """
+        update the index after a container event
+        """
+        action = event.get('Action') or event.get('status') or ''
+        container_id = event.get('id')
+        if not container_id or action.startswith(IGNORED_ACTIONS):
+            return
+
+        project_name = (event.get('Actor', {}).get('Attributes') or {}).get(LABEL_PROJECT)
+        if action == 'destroy':
+            with self.lock:
+                self.containers.pop(container_id, None)
+        else:
+            try:
+                item = api.inspect_container(container_id)
+                with self.lock:
+                    self.containers[container_id] = item
+            except docker_errors.NotFound:
+                with self.lock:
+                    self.containers.pop(container_id, None)
+        if project_name:
+            _notify(project_name)
+
+    def active_projects(self):
+        """
+        names of the compose projects with at least one running container
+        """
+        with self.lock:
+            items = list(self.containers.values())
+        return sorted(set(_labels(item)[LABEL_PROJECT] for item in items
+                          if _is_running(item) and LABEL_PROJECT in _labels(item)))
+
+    def states(self):
+        """
+        (project, service, running) of every compose container, one-off excluded
+        """
+        with self.lock:
+            items = list(self.containers.values())
+        return [(_labels(item)[LABEL_PROJECT], _labels(item).get(LABEL_SERVICE), _is_running(item))
+                for item in items
+                if LABEL_PROJECT in _labels(item) and _labels(item).get(LABEL_ONE_OFF) != 'True']
+
+    def project_containers(self, project_name):
+        """
+        inspect data of the containers of a compose project, one-off excluded
+        """
+        with self.lock:
+            items = list(self.containers.values())
+        return [item for item in items
+                if _labels(item).get(LABEL_PROJECT) == project_name
+                and _labels(item).get(LABEL_ONE_OFF) != 'True']
+
+
+def get_index(host=None):
+    """
+    synced container index of host (by default the one selected by the
+    current thread), None while not available
+    """
+    global _indexes_pid # pylint: disable=global-statement
+
+    host = host or current_host()
+    with _lock:
+        if _indexes_pid != os.getpid():
+            # the watching threads of the parent process did not survive the fork
+            _indexes.clear()
+            _indexes_pid = os.getpid()
+        index = _indexes.get(host)
+        if index is None:
+            index = _indexes[host] = ContainerIndex(host).start()
+    return index if index.synced else None
+
+def forget_index(host):
+    """
+    stop watching host, e.g. once it has been removed
+    """
+    with _lock:
+        index = _indexes.pop(host, None)
+    if index is not None:
+        index.stop()
@@ -0,0 +1,221 @@
+"""
+named docker hosts and the binding of users and projects to them
+
+hosts and bindings are kept in DOCKER_HOSTS_FILE, shared by all workers.
+Each thread talks to the host it selected instead of the process wide
+DOCKER_HOST, and fan_out() runs a call on every host concurrently.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from json import dumps, loads
+from time import time
+
+DOCKER_HOSTS_FILE = os.getenv('DOCKER_HOSTS_FILE', './docker-hosts.json')
+FAN_OUT_WORKERS = int(os.getenv('FAN_OUT_WORKERS', '8'))
+# seconds fan_out waits for a host, which is then skipped for FAN_OUT_BACKOFF seconds
+FAN_OUT_TIMEOUT = float(os.getenv('FAN_OUT_TIMEOUT', '5'))
+FAN_OUT_BACKOFF = float(os.getenv('FAN_OUT_BACKOFF', '30'))
+# DOCKER_HOST of the process (None: local socket) unless set in DOCKER_HOSTS_FILE
+DEFAULT_HOST = 'default'
+
+_lock = threading.Lock()
+_config = {}
+_selected = threading.local()
+_unresponsive = {}
+
+
+def _empty():
+    return dict(hosts={}, bindings={})
+
+def _read():
+    """
+    DOCKER_HOSTS_FILE, read again only when it changed on disk
+    """
+    try:
+        mtime = os.stat(DOCKER_HOSTS_FILE).st_mtime_ns
+    except OSError:
+        return _empty()
+    with _lock:
+        if _config.get('mtime') != mtime:
+            try:
+                with open(DOCKER_HOSTS_FILE) as hosts_file:
+                    _config['data'] = dict(_empty(), **loads(hosts_file.read()))
+            except ValueError:
+                logging.exception('cannot read ' + DOCKER_HOSTS_FILE)
+                _config['data'] = _empty()
+            _config['mtime'] = mtime
+        return _config['data']
+
+@contextmanager
+def _locked_config():
+    """
+    the hosts and bindings, locked against other processes and saved back if modified
+    """
+    with open(DOCKER_HOSTS_FILE + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with _lock:
+            _config.clear()
+        config = _read()
+        original = dumps(config, sort_keys=True)
+        config = loads(original)
+        yield config
+        if dumps(config, sort_keys=True) != original:
+            tmp_path = DOCKER_HOSTS_FILE + '.' + str(os.getpid())
+            with open(tmp_path, 'w') as hosts_file:
+                hosts_file.write(dumps(config, indent=1, sort_keys=True))
+            os.replace(tmp_path, DOCKER_HOSTS_FILE)
+
+def hosts():
+    """
+    name -> DOCKER_HOST url of every host
+    """
+    result = {DEFAULT_HOST: os.getenv('DOCKER_HOST')}
+    result.update(_read()['hosts'])
+    return result
+
+def name_of(url):
+    """
+    name url is registered under, DEFAULT_HOST first; None if it is not registered
+    """
+    registered = hosts()
+    for name in [DEFAULT_HOST] + sorted(registered):
+        if registered[name] == url:
+            return name
+    return None
+
+def distinct_hosts():
+    """
+    one name per docker daemon, hosts registered under several names counting once
+    """
+    return sorted(set(name_of(url) for url in hosts().values()))
+
+def add_host(name, url):
+    """
+    register url as host name, replacing the previous url of name
+    """
+    with _locked_config() as config:
+        config['hosts'][name] = url
+
+def remove_host(name):
+    """
+    forget host name, the users and projects bound to it go back to DEFAULT_HOST
+    """
+    with _locked_config() as config:
+        config['hosts'].pop(name, None)
+        for key in [key for key, bound in config['bindings'].items() if bound == name]:
+            del config['bindings'][key]
+
+def _binding_key(user, project=None):
+    return user + '/' + project if project else user
+
+def bind(user, name, project=None):
+    """
+    bind a user, or one of its projects, to host name; None removes the binding
+    """
+    with _locked_config() as config:
+        if name is None:
+            config['bindings'].pop(_binding_key(user, project), None)
+        else:
+            config['bindings'][_binding_key(user, project)] = name
+
+def bindings(user):
+    """
+    project (None for the user itself) -> host name of the bindings of user
+    """
+    result = {}
+    for key, name in _read()['bindings'].items():
+        bound_user, _, project = key.partition('/')
+        if bound_user == user:
+            result[project or None] = name
+    return result
+
+def host_for(user, project=None):
+    """
+    name of the host project of user runs on: its own binding, else the user's one
+    """
+    bound = _read()['bindings']
+    name = (project and bound.get(_binding_key(user, project))) or bound.get(user) or DEFAULT_HOST
+    return name if name in hosts() else DEFAULT_HOST
+
+def select_host(name):
+    """
+    make the current thread talk to host name, None for the process DOCKER_HOST
+    """
+    _selected.name = name
+    _selected.url = hosts().get(name) if name is not None else None
+
+def selected_host():
+    """
+    name of the host selected by the current thread
+    """
+    return getattr(_selected, 'name', None) or DEFAULT_HOST
+
+def current_host():
+    """
+    DOCKER_HOST url the current thread talks to
+    """
+    if getattr(_selected, 'name', None) is None:
+        return hosts()[DEFAULT_HOST]
+    return _selected.url
+
+@contextmanager
+def using_host(name):
+    """
+    select host name for the duration of the block
+    """
+    previous = (getattr(_selected, 'name', None), getattr(_selected, 'url', None))
+    select_host(name)
+    try:
+        yield
+    finally:
+        _selected.name, _selected.url = previous
+
+class HostTimeout(Exception):
+    """
+    a docker host did not answer within FAN_OUT_TIMEOUT
+    """
+
+
+def fan_out(func, names=None):
+    """
+    host name -> (result, error) of func() run on every docker daemon concurrently;
+    hosts that do not answer within FAN_OUT_TIMEOUT get a HostTimeout error
+    """
+    names = distinct_hosts() if names is None else list(names)
+
+    def call(name):
+        with using_host(name):
+            try:
+                return func(), None
+            except Exception as err: # pylint: disable=broad-except
+                logging.warning('docker host %s failed: %s', name, err)
+                return None, err
+
+    results = {}
+    with _lock:
+        for name in names:
+            if _unresponsive.get(name, 0) > time():
+                results[name] = (None, HostTimeout('docker host %s did not answer recently' % name))
+    pending = [name for name in names if name not in results]
+    if not pending:
+        return results
+
+    # not a with block: its exit would wait for the hosts that time out
+    executor = ThreadPoolExecutor(max_workers=min(FAN_OUT_WORKERS, len(pending)))
+    futures = dict((executor.submit(call, name), name) for name in pending)
+    executor.shutdown(wait=False)
+    done, _ = wait(futures, timeout=FAN_OUT_TIMEOUT)
+    for future, name in futures.items():
+        if future in done:
+            results[name] = future.result()
+            continue
+        logging.warning('docker host %s did not answer within %s s', name, FAN_OUT_TIMEOUT)
+        results[name] = (None, HostTimeout('docker host %s did not answer within %s s' % (name, FAN_OUT_TIMEOUT)))
+        with _lock:
+            _unresponsive[name] = time() + FAN_OUT_BACKOFF
+    return results
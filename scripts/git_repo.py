@@ -2,15 +2,40 @@
 git functionalities
 """
 
+import fcntl
+import hashlib
 import os
 import logging
-from git import Repo
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from json import dumps, loads
+from time import sleep, time
+from scripts.lazy import lazy_import
+from scripts.metrics import timed
+
+git = lazy_import('git')
 
 git_repo = os.getenv('GIT_REPO')
 
 logging.basicConfig(level=logging.DEBUG)
 
 GIT_YML_PATH = '/opt/docker-compose-projects-git/'
+GIT_MIRRORS_PATH = os.getenv('GIT_MIRRORS_PATH', './mirrors')
+GIT_MIRROR_REFRESH = float(os.getenv('GIT_MIRROR_REFRESH', '600'))
+GIT_PULL_INTERVAL = float(os.getenv('GIT_PULL_INTERVAL', '60'))
+# branches and tags only: GitHub also serves refs/pull/*, which --mirror would fetch
+MIRROR_REFSPECS = ('+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*')
+GIT_SYNC_STATE = os.getenv('GIT_SYNC_STATE', GIT_YML_PATH.rstrip('/') + '.sync.json')
+
+_mirrors_lock = threading.Lock()
+_mirrors = set()
+_creating = set()
+_mirror_refresh_pid = None
+_sync_lock = threading.Lock()
+_sync_wakeup = threading.Event()
+_sync_pid = None
 
 def git_pull():
     """
@@ -18,21 +43,255 @@ def git_pull():
     """
     if git_repo:
         logging.info('git pull ' + git_repo)
-        Repo(GIT_YML_PATH).remote('origin').pull()
+        with timed('git_operation_duration_seconds', operation='pull'):
+            git.Repo(GIT_YML_PATH).remote('origin').pull()
     else:
         logging.info('will not execute git pull: not a git repository')
 
-def git_clone(sRepo, sPath):
-    logging.info('git clone ' +  sRepo)
-    Repo.clone_from(sRepo, sPath)
+def _mirror_refs(repo):
+    """
+    fetch only the branches and tags of origin, and follow its default branch
+    """
+    repo.git.config('--replace-all', 'remote.origin.fetch', MIRROR_REFSPECS[0])
+    for sRefspec in MIRROR_REFSPECS[1:]:
+        repo.git.config('--add', 'remote.origin.fetch', sRefspec)
+    for sLine in repo.git.ls_remote('--symref', 'origin', 'HEAD').splitlines():
+        if sLine.startswith('ref: '):
+            repo.git.symbolic_ref('HEAD', sLine[len('ref: '):].split()[0])
+
+def git_mirror(sRepo, sPath):
+    """
+    create or update a bare mirror of the branches and tags of sRepo in sPath
+    """
+    if os.path.isdir(sPath):
+        logging.info('git remote update ' + sPath)
+        repo = git.Repo(sPath)
+        # mirrors made with clone --mirror also fetched refs/pull/*
+        _mirror_refs(repo)
+        with timed('git_operation_duration_seconds', operation='mirror_update'):
+            repo.git.remote('update', '--prune')
+    else:
+        logging.info('git mirror ' + sRepo)
+        # sPath only appears once the mirror is complete
+        sTmpPath = sPath + '.' + str(os.getpid())
+        shutil.rmtree(sTmpPath, ignore_errors=True)
+        with timed('git_operation_duration_seconds', operation='mirror_clone'):
+            repo = git.Repo.init(sTmpPath, bare=True)
+            repo.create_remote('origin', sRepo)
+            _mirror_refs(repo)
+            repo.git.remote('update', '--prune')
+        os.rename(sTmpPath, sPath)
     return sPath
 
+@contextmanager
+def _locked(sPath, bWait=True):
+    """
+    exclusive lock on sPath shared by all processes, yields False if busy and not bWait
+    """
+    with open(sPath + '.lock', 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if bWait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            yield False
+            return
+        yield True
 
+def mirror_path(sRepo):
+    """
+    path of the cached mirror of sRepo
+    """
+    sName = re.sub(r'[^A-Za-z0-9_.-]', '_', sRepo.rstrip('/').split('/')[-1])
+    return os.path.join(GIT_MIRRORS_PATH, hashlib.sha1(sRepo.encode('utf-8')).hexdigest()[:12] + '-' + sName)
 
-if git_repo:
-    logging.info('git repo: ' + git_repo)
-    if os.path.isdir(os.path.join(GIT_YML_PATH, '.git')):
-        git_pull()
+def _refresh_mirrors():
+    """
+    keep the mirrors used by this process up to date
+    """
+    while True:
+        sleep(GIT_MIRROR_REFRESH)
+        with _mirrors_lock:
+            aMirrors = list(_mirrors)
+        for sRepo, sPath in aMirrors:
+            with _locked(sPath, False) as bLocked:
+                if bLocked:
+                    try:
+                        git_mirror(sRepo, sPath)
+                    except Exception: # pylint: disable=broad-except
+                        logging.exception('git mirror refresh failed: ' + sRepo)
+
+def _create_mirror(sRepo, sPath):
+    """
+    create the mirror of sRepo, unless another process is already doing it
+    """
+    try:
+        with _locked(sPath, False) as bLocked:
+            if bLocked and not os.path.isdir(sPath):
+                git_mirror(sRepo, sPath)
+    except Exception: # pylint: disable=broad-except
+        logging.exception('git mirror failed: ' + sRepo)
+    finally:
+        with _mirrors_lock:
+            _creating.discard(sPath)
+
+def cached_mirror(sRepo):
+    """
+    local mirror of sRepo, refreshed in the background; None while it is
+    being created in the background on first use
+    """
+    global _mirror_refresh_pid # pylint: disable=global-statement
+
+    sPath = mirror_path(sRepo)
+    if not os.path.isdir(GIT_MIRRORS_PATH):
+        os.makedirs(GIT_MIRRORS_PATH, exist_ok=True)
+
+    with _mirrors_lock:
+        _mirrors.add((sRepo, sPath))
+        if _mirror_refresh_pid != os.getpid():
+            _mirror_refresh_pid = os.getpid()
+            _creating.clear()
+            thread = threading.Thread(target=_refresh_mirrors, name='git-mirrors')
+            thread.daemon = True
+            thread.start()
+        if not os.path.isdir(sPath) and sPath not in _creating:
+            _creating.add(sPath)
+            thread = threading.Thread(target=_create_mirror, args=(sRepo, sPath), name='git-mirror')
+            thread.daemon = True
+            thread.start()
+    return sPath if os.path.isdir(sPath) else None
+
+def shared_mirror(sRepo):
+    """
+    mirror of sRepo at mirror_path(sRepo), the one create_project uses, created
+    or updated now; waits while another process is doing it
+    """
+    sPath = mirror_path(sRepo)
+    if not os.path.isdir(GIT_MIRRORS_PATH):
+        os.makedirs(GIT_MIRRORS_PATH, exist_ok=True)
+    with _locked(sPath):
+        return git_mirror(sRepo, sPath)
+
+def git_clone(sRepo, sPath, sMirror=None, bUpdate=True):
+    """
+    clone sRepo in sPath; from a local mirror of it if given, hardlinking its
+    objects, then fetching what the mirror is missing unless bUpdate is False
+    """
+    if sMirror:
+        logging.info('git clone ' + sRepo + ' from ' + sMirror)
+        with timed('git_operation_duration_seconds', operation='clone_local'):
+            origin = git.Repo.clone_from(sMirror, sPath).remote('origin')
+        origin.set_url(sRepo)
+        if bUpdate:
+            with timed('git_operation_duration_seconds', operation='pull'):
+                origin.pull()
     else:
-        logging.info('git clone ' +  git_repo)
-        Repo.clone_from(git_repo, GIT_YML_PATH)
+        logging.info('git clone ' +  sRepo)
+        with timed('git_operation_duration_seconds', operation='clone'):
+            git.Repo.clone_from(sRepo, sPath)
+    return sPath
+
+def git_sync_state():
+    """
+    commit, time and failure flag of the last sync of the GIT_REPO checkout;
+    nothing that could carry the repository url and its credentials
+    """
+    try:
+        with open(GIT_SYNC_STATE) as state_file:
+            state = loads(state_file.read())
+    except (IOError, ValueError):
+        return {}
+    return dict(commit=state.get('commit'), synced_at=state.get('synced_at'), error=bool(state.get('error')))
+
+def _sync_checkout():
+    """
+    clone or pull the GIT_REPO checkout and record the result in GIT_SYNC_STATE
+    """
+    state = dict(synced_at=time(), commit=git_sync_state().get('commit'), error=False)
+    try:
+        if os.path.isdir(os.path.join(GIT_YML_PATH, '.git')):
+            git_pull()
+        else:
+            logging.info('git clone ' +  git_repo)
+            with timed('git_operation_duration_seconds', operation='clone'):
+                git.Repo.clone_from(git_repo, GIT_YML_PATH)
+        state['commit'] = git.Repo(GIT_YML_PATH).head.commit.hexsha
+    except Exception: # pylint: disable=broad-except
+        # the details, which may hold the url, only go to the log
+        logging.exception('git sync failed')
+        state['error'] = True
+
+    tmp_path = GIT_SYNC_STATE + '.' + str(os.getpid())
+    with open(tmp_path, 'w') as state_file:
+        state_file.write(dumps(state))
+    os.replace(tmp_path, GIT_SYNC_STATE)
+
+def _take_pending(sPending):
+    """
+    True if a sync was left pending, which is then cleared
+    """
+    try:
+        os.remove(sPending)
+        return True
+    except OSError:
+        return False
+
+def git_sync(bRequested=False):
+    """
+    clone or pull the GIT_REPO checkout, unless another process is already
+    doing it; a requested sync is then left pending for that process to run
+    once more before it releases the lock
+    """
+    sPending = GIT_SYNC_STATE + '.pending'
+    if bRequested:
+        open(sPending, 'w').close()
+    while True:
+        with _locked(GIT_YML_PATH.rstrip('/'), False) as bLocked:
+            if not bLocked:
+                return
+            _take_pending(sPending)
+            _sync_checkout()
+            while _take_pending(sPending):
+                _sync_checkout()
+        # left pending while the lock was being released
+        if not os.path.exists(sPending):
+            return
+
+def _git_sync_loop(on_change):
+    """
+    sync every GIT_PULL_INTERVAL seconds or when woken up, calling on_change
+    whenever the checked out commit differs from the one seen before
+    """
+    seen = None
+    requested = False
+    while True:
+        git_sync(requested)
+        commit = git_sync_state().get('commit')
+        if commit != seen:
+            seen = commit
+            on_change()
+        requested = _sync_wakeup.wait(GIT_PULL_INTERVAL)
+        _sync_wakeup.clear()
+
+def start_git_sync(on_change):
+    """
+    start the background sync of the GIT_REPO checkout, once per process;
+    requests keep reading the current checkout meanwhile
+    """
+    global _sync_pid # pylint: disable=global-statement
+
+    if not git_repo:
+        return
+    with _sync_lock:
+        if _sync_pid == os.getpid():
+            return
+        _sync_pid = os.getpid()
+        _sync_wakeup.clear()
+
+    thread = threading.Thread(target=_git_sync_loop, args=(on_change,), name='git-sync')
+    thread.daemon = True
+    thread.start()
+
+def request_git_sync():
+    """
+    sync now instead of waiting for the next interval
+    """
+    _sync_wakeup.set()
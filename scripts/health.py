@@ -0,0 +1,82 @@
+"""
+liveness, readiness and cached daemon info for health checks
+"""
+
+import logging
+import os
+import threading
+from time import time
+from scripts.bridge import client, info
+from scripts.container_state import get_index
+from scripts.docker_hosts import current_host, selected_host, fan_out
+from scripts.metrics import cache_hit, cache_miss
+
+READINESS_TTL = float(os.getenv('READINESS_TTL', '2'))
+INFO_TTL = float(os.getenv('DOCKER_INFO_TTL', '300'))
+
+_started = time()
+_lock = threading.Lock()
+_ping = {}
+_info = {}
+
+
+def liveness():
+    """
+    in-process only: the worker is able to answer
+    """
+    return dict(status='ok', pid=os.getpid(), uptime=time() - _started)
+
+def readiness():
+    """
+    (ready, details) of the current docker host, from a ping cached READINESS_TTL seconds
+    """
+    host = current_host()
+    with _lock:
+        entry = _ping.get(host)
+    if entry is not None and time() - entry[0] < READINESS_TTL:
+        cache_hit('docker_ping')
+        return entry[1], entry[2]
+    cache_miss('docker_ping')
+
+    name = selected_host()
+    try:
+        client(host).ping()
+        ready, details = True, dict(status='ok', name=name, docker_host=host)
+    except Exception as err: # pylint: disable=broad-except
+        logging.warning('docker ping failed: %s', err)
+        ready, details = False, dict(status='unavailable', name=name, docker_host=host, error=str(err))
+    with _lock:
+        _ping[host] = (time(), ready, details)
+    return ready, details
+
+def readiness_all():
+    """
+    (ready, details) of every docker host, pinged concurrently;
+    ready when all of them are
+    """
+    results = fan_out(readiness)
+    details = dict((name, result[1] if error is None else dict(status='unavailable', error=str(error)))
+                   for name, (result, error) in results.items())
+    ready = all(error is None and result[0] for result, error in results.values())
+    return ready, dict(status='ok' if ready else 'unavailable', hosts=details)
+
+def daemon_info():
+    """
+    compose version, docker version and name of the current docker host,
+    refreshed every DOCKER_INFO_TTL seconds
+    """
+    host = current_host()
+    index = get_index(host)
+    if index is not None and index.info:
+        return info(index.info)
+
+    with _lock:
+        entry = _info.get(host)
+    if entry is not None and time() - entry[0] < INFO_TTL:
+        cache_hit('docker_info')
+        return entry[1]
+    cache_miss('docker_info')
+    value = info(client(host).info())
+    with _lock:
+        _info[host] = (time(), value)
+    return value
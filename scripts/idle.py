@@ -0,0 +1,158 @@
+"""
+idle project auto-stop and wake-on-request
+
+nginx writes `$host $msec` for every proxied project request to
+IDLE_ACCESS_LOG. One worker follows that log by file offset to know when
+each project host was last hit, and stops the running projects idle for more
+than IDLE_TIMEOUT seconds. A request reaching a stopped project makes nginx
+call the wake endpoint, which starts the project and waits for its port.
+"""
+
+import fcntl
+import logging
+import os
+import socket
+import threading
+from time import sleep, time
+from scripts.bridge import get_project
+from scripts.cloudflare import cloudflare_site
+from scripts.docker_hosts import host_for, using_host
+from scripts.jobs import submit
+from scripts.overview import normalize_name, container_states
+from scripts.port_table import allocate_port
+from scripts.upstream_map import project_hosts
+
+IDLE_ACCESS_LOG = os.getenv('IDLE_ACCESS_LOG', './logs/upstream.log')
+# 0 disables the auto-stop
+IDLE_TIMEOUT = float(os.getenv('IDLE_TIMEOUT', '0'))
+IDLE_CHECK_INTERVAL = float(os.getenv('IDLE_CHECK_INTERVAL', '60'))
+WAKE_TIMEOUT = float(os.getenv('WAKE_TIMEOUT', '60'))
+WAKE_UPSTREAM_HOST = os.getenv('WAKE_UPSTREAM_HOST', '127.0.0.1')
+
+_lock = threading.Lock()
+_monitor_pid = None
+_waking = {}
+
+
+class AccessLogFollower(object):
+    """
+    reads the lines appended to an access log since the previous call
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.offset = None
+
+    def hits(self):
+        """
+        host -> time of its latest request among the new lines
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return {}
+        if self.offset is None:
+            # history before the monitor started is not looked at
+            self.inode, self.offset = stat.st_ino, stat.st_size
+        elif stat.st_ino != self.inode or stat.st_size < self.offset:
+            # rotated or truncated
+            self.inode, self.offset = stat.st_ino, 0
+
+        hits = {}
+        with open(self.path, 'rb') as log_file:
+            log_file.seek(self.offset)
+            for line in log_file:
+                if not line.endswith(b'\n'):
+                    break # being written, read it next time
+                self.offset += len(line)
+                fields = line.decode('latin-1').split()
+                if len(fields) >= 2:
+                    try:
+                        hits[fields[0].lower()] = float(fields[1])
+                    except ValueError:
+                        pass
+        return hits
+
+
+def _stop_idle(last_hit, follower):
+    now = time()
+    last_hit.update(follower.hits())
+    running = set(project for project, _, is_running in container_states() if is_running)
+
+    for hostname, (user, name, path) in project_hosts(cloudflare_site()).items():
+        if normalize_name(name) not in running:
+            last_hit.pop(hostname, None)
+            continue
+        # a project seen running for the first time counts as just hit
+        if now - last_hit.setdefault(hostname, now) > IDLE_TIMEOUT:
+            logging.info('stopping idle project ' + hostname)
+            with using_host(host_for(user, name)):
+                submit(user, name, 'stop', get_project(path).stop)
+            last_hit.pop(hostname, None)
+
+def _monitor():
+    with open(IDLE_ACCESS_LOG + '.lock', 'w') as lock_file:
+        # a single worker follows the log, the others wait to take over
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        follower = AccessLogFollower(IDLE_ACCESS_LOG)
+        last_hit = {}
+        while True:
+            try:
+                _stop_idle(last_hit, follower)
+            except Exception: # pylint: disable=broad-except
+                logging.exception('idle check failed')
+            sleep(IDLE_CHECK_INTERVAL)
+
+def start_idle_monitor():
+    """
+    start the idle project monitor of this process, if IDLE_TIMEOUT is set
+    """
+    global _monitor_pid # pylint: disable=global-statement
+
+    if IDLE_TIMEOUT <= 0:
+        return
+    with _lock:
+        if _monitor_pid == os.getpid():
+            return
+        _monitor_pid = os.getpid()
+    thread = threading.Thread(target=_monitor, name='idle-monitor')
+    thread.daemon = True
+    thread.start()
+
+def _port_open(port):
+    try:
+        socket.create_connection((WAKE_UPSTREAM_HOST, port), timeout=1).close()
+        return True
+    except (socket.error, socket.timeout):
+        return False
+
+def wake(hostname):
+    """
+    start the project served on hostname and wait until its port answers;
+    returns False if it is unknown or did not answer within WAKE_TIMEOUT
+    """
+    hostname = hostname.lower().split(':')[0]
+    target = project_hosts(cloudflare_site()).get(hostname)
+    if target is None:
+        return False
+    user, name, path = target
+    port = allocate_port(hostname)
+
+    with _lock:
+        started = _waking.get(hostname)
+        if started is None or time() - started > WAKE_TIMEOUT:
+            # concurrent requests for the same host share one start job
+            _waking[hostname] = time()
+            logging.info('waking project ' + hostname)
+            with using_host(host_for(user, name)):
+                submit(user, name, 'start', get_project(path).start)
+
+    deadline = time() + WAKE_TIMEOUT
+    while time() < deadline:
+        if _port_open(port):
+            with _lock:
+                _waking.pop(hostname, None)
+            return True
+        sleep(0.5)
+    return False
@@ -0,0 +1,286 @@
+"""
+asynchronous docker-compose jobs
+
+jobs run on a thread pool, one at a time per project. Their state is kept
+in JOBS_DIR so that every forked worker of app_server.py can report it.
+"""
+
+import fcntl
+import logging
+import os
+import sys
+import threading
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps, loads
+from time import time
+from uuid import uuid4
+from scripts.lazy import import_module
+
+JOBS_DIR = os.getenv('JOBS_DIR', '/tmp/docker-compose-ui-jobs')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_RETENTION = int(os.getenv('JOB_RETENTION', '3600'))
+MAX_EVENTS = 500
+SAVE_INTERVAL = 0.5
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+_lock = threading.Lock()
+_pending = {}
+_executor = None
+_executor_pid = None
+_current = threading.local()
+
+
+class Job(object):
+    """
+    a docker-compose operation on a project
+    """
+
+    def __init__(self, owner, project, command, func):
+        self.id = uuid4().hex
+        self.key = owner + '.' + project
+        self.owner = owner
+        self.project = project
+        self.command = command
+        self.func = func
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time()
+        self.started = None
+        self.finished = None
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.event_count = 0
+        self.saved = 0
+        # jobs only run in the memory of this process
+        self.pid = os.getpid()
+
+    def add_event(self, message):
+        """
+        record a progress message
+        """
+        self.event_count += 1
+        self.events.append(dict(seq=self.event_count, time=time(), message=message))
+        if time() - self.saved > SAVE_INTERVAL:
+            self.save()
+
+    def to_dict(self):
+        """
+        json representation of the job
+        """
+        return dict(id=self.id, owner=self.owner, project=self.project, command=self.command,
+                    pid=self.pid, state=self.state, result=self.result, error=self.error,
+                    created=self.created, started=self.started, finished=self.finished,
+                    events=list(self.events))
+
+    def save(self):
+        """
+        atomically write the job state to JOBS_DIR
+        """
+        self.saved = time()
+        tmp_path = _path(self.id) + '.' + str(os.getpid())
+        with open(tmp_path, 'w') as job_file:
+            # a result json cannot represent, e.g. compose objects, is saved as its str()
+            job_file.write(dumps(self.to_dict(), default=str))
+        os.replace(tmp_path, _path(self.id))
+
+
+class JobEventHandler(logging.Handler):
+    """
+    turns compose log records of a job thread into job events
+    """
+
+    def emit(self, record):
+        job = getattr(_current, 'job', None)
+        if job is not None:
+            job.add_event(self.format(record))
+
+
+class JobStreamWriter(object):
+    """
+    turns the per container status lines compose writes during parallel operations
+    into job events, passing the lines of other threads on to compose's own writer
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def add_object(self, msg, obj_index):
+        self.writer.add_object(msg, obj_index)
+
+    def write_initial(self, msg, obj_index):
+        if getattr(_current, 'job', None) is None:
+            self.writer.write_initial(msg, obj_index)
+
+    def write(self, msg, obj_index, status, color_func):
+        job = getattr(_current, 'job', None)
+        if job is None:
+            self.writer.write(msg, obj_index, status, color_func)
+        elif msg is not None:
+            job.add_event('%s %s ... %s' % (msg, obj_index, status))
+
+
+def _path(job_id, suffix='.json'):
+    return os.path.join(JOBS_DIR, os.path.basename(job_id) + suffix)
+
+def _install_stream_writer():
+    """
+    make compose's parallel operations report their progress to the job they run in
+    """
+    parallel = import_module('compose.parallel')
+
+    writer = parallel.ParallelStreamWriter.instance
+    if not isinstance(writer, JobStreamWriter):
+        parallel.ParallelStreamWriter.instance = JobStreamWriter(
+            writer or parallel.ParallelStreamWriter(parallel.get_output_stream(sys.stderr)))
+
+def _get_executor():
+    global _executor, _executor_pid # pylint: disable=global-statement
+
+    if _executor_pid != os.getpid():
+        if not os.path.isdir(JOBS_DIR):
+            os.makedirs(JOBS_DIR, exist_ok=True)
+        logging.getLogger('compose').addHandler(JobEventHandler())
+        _install_stream_writer()
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+        _executor_pid = os.getpid()
+    return _executor
+
+def _cancel_requested(job):
+    return os.path.exists(_path(job.id, '.cancel'))
+
+def _execute(job):
+    """
+    run a job holding the project lock shared by all workers
+    """
+    if _cancel_requested(job):
+        job.state = CANCELLED
+        job.finished = time()
+        job.save()
+        return
+
+    with open(_path(job.key, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        job.state = RUNNING
+        job.started = time()
+        job.add_event('%s %s started' % (job.command, job.project))
+        job.save()
+        _current.job = job
+        try:
+            job.result = job.func()
+            job.state = FINISHED
+        except Exception as err: # pylint: disable=broad-except
+            traceback.print_exc()
+            job.error = str(err)
+            job.state = FAILED
+        finally:
+            _current.job = None
+            job.finished = time()
+            job.add_event('%s %s %s' % (job.command, job.project, job.state))
+            job.save()
+
+def _run(key):
+    """
+    execute the queued jobs of a project in submission order
+    """
+    while True:
+        with _lock:
+            job = _pending[key][0]
+        try:
+            _execute(job)
+        finally:
+            with _lock:
+                _pending[key].popleft()
+                if not _pending[key]:
+                    del _pending[key]
+                    return
+
+def _prune():
+    """
+    forget jobs finished more than JOB_RETENTION seconds ago
+    """
+    limit = time() - JOB_RETENTION
+    for name in os.listdir(JOBS_DIR):
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            if not name.endswith('.lock') and os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            pass
+
+def submit(owner, project, command, func):
+    """
+    queue func() as a job of owner on project and return the job
+    """
+    executor = _get_executor()
+    _prune()
+
+    job = Job(owner, project, command, func)
+    job.add_event('%s %s queued' % (command, project))
+    job.save()
+    with _lock:
+        queue = _pending.setdefault(job.key, deque())
+        queue.append(job)
+        if len(queue) == 1:
+            executor.submit(_run, job.key)
+    return job
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _fail_orphan(job):
+    """
+    mark a queued or running job failed if the process running it is gone,
+    e.g. a worker restarted or killed during a long build
+    """
+    if job['state'] not in (QUEUED, RUNNING) or not job.get('pid') or _process_exists(job['pid']):
+        return job
+    job.update(state=FAILED, finished=time(), error='worker %d exited before the job finished' % job['pid'])
+    tmp_path = _path(job['id']) + '.' + str(os.getpid())
+    with open(tmp_path, 'w') as job_file:
+        job_file.write(dumps(job, default=str))
+    os.replace(tmp_path, _path(job['id']))
+    return job
+
+def get_job(job_id):
+    """
+    job state as a dict, None if unknown
+    """
+    try:
+        with open(_path(job_id)) as job_file:
+            job = loads(job_file.read())
+    except (IOError, ValueError):
+        return None
+    return _fail_orphan(job)
+
+def list_jobs(owner):
+    """
+    jobs of owner, most recent first
+    """
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    jobs = [get_job(name[:-len('.json')]) for name in os.listdir(JOBS_DIR) if name.endswith('.json')]
+    return sorted([job for job in jobs if job and job['owner'] == owner],
+                  key=lambda job: job['created'], reverse=True)
+
+def cancel(job_id):
+    """
+    cancel a queued job; running compose operations cannot be interrupted
+    """
+    job = get_job(job_id)
+    if job is not None and job['state'] == QUEUED:
+        open(_path(job_id, '.cancel'), 'w').close()
+        job['cancel_requested'] = True
+    return job
@@ -0,0 +1,54 @@
+"""
+modules imported on first use, so that importing the app stays fast
+"""
+
+import importlib
+import sys
+import threading
+
+# one import at a time: a package imported by two threads at once, e.g. the
+# startup preload and a request, can be seen half initialized by one of them
+_import_lock = threading.RLock()
+_imported = set()
+
+
+class LazyModule(object):
+    """
+    stands for a module until one of its attributes is read
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(import_module(self._name), attr)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self._name
+
+
+def import_module(name):
+    """
+    importlib.import_module, one thread at a time
+    """
+    if name in _imported:
+        # after the first time this is a lookup in sys.modules
+        return sys.modules[name]
+    with _import_lock:
+        module = importlib.import_module(name)
+        _imported.add(name)
+    return module
+
+def lazy_import(name):
+    """
+    module name, imported when first used
+    """
+    return LazyModule(name)
+
+def is_instance(obj, module_name, class_name):
+    """
+    isinstance(obj, module_name.class_name) without importing module_name:
+    nothing is an instance of a class that was never imported
+    """
+    module = sys.modules.get(module_name)
+    return module is not None and isinstance(obj, getattr(module, class_name))
@@ -0,0 +1,130 @@
+"""
+bounded memory streaming of container logs
+"""
+
+import heapq
+import threading
+from json import dumps
+from queue import Queue, Empty, Full
+
+MAX_LINE_BYTES = 64 * 1024
+BUFFER_LINES = 1000
+
+_DONE = object()
+
+
+def _split_lines(chunks):
+    """
+    split a docker log stream into lines of at most MAX_LINE_BYTES
+    """
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        while True:
+            end = pending.find(b'\n')
+            if end < 0:
+                break
+            yield pending[:end]
+            pending = pending[end + 1:]
+        while len(pending) > MAX_LINE_BYTES:
+            yield pending[:MAX_LINE_BYTES]
+            pending = pending[MAX_LINE_BYTES:]
+    if pending:
+        yield pending
+
+def _sort_key(timestamp):
+    """
+    RFC3339Nano timestamps drop trailing zeros, pad them so they sort as text
+    """
+    seconds, _, fraction = timestamp.rstrip('Z').partition('.')
+    return seconds + '.' + fraction.ljust(9, '0')
+
+def _entries(name, chunks):
+    """
+    (sort key, container name, timestamp, text) for every line of a container
+    """
+    for line in _split_lines(chunks):
+        timestamp, _, text = line.decode('utf8', 'replace').partition(' ')
+        yield (_sort_key(timestamp), name, timestamp, text)
+
+def _open(container, **options):
+    return container.logs(stream=True, timestamps=True, **options)
+
+def _close(stream):
+    close = getattr(stream, 'close', None)
+    if close is not None:
+        close()
+
+def _merged(container_list, options):
+    """
+    entries of all containers merged by timestamp, one line buffered per container
+    """
+    streams = [(container.name, _open(container, **options)) for container in container_list]
+    try:
+        for entry in heapq.merge(*[_entries(name, stream) for name, stream in streams]):
+            yield entry
+    finally:
+        for _, stream in streams:
+            _close(stream)
+
+def _followed(container_list, options):
+    """
+    entries of all containers in arrival order, each container in its own order
+    """
+    entries = Queue(maxsize=BUFFER_LINES)
+    stop = threading.Event()
+    streams = []
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                entries.put(item, timeout=0.5)
+                return True
+            except Full:
+                pass
+        return False
+
+    def read(container):
+        try:
+            stream = _open(container, **options)
+            streams.append(stream)
+            for entry in _entries(container.name, stream):
+                if not put(entry):
+                    return
+        finally:
+            put(_DONE)
+
+    readers = [threading.Thread(target=read, args=(container,)) for container in container_list]
+    for reader in readers:
+        reader.daemon = True
+        reader.start()
+
+    running = len(readers)
+    try:
+        while running:
+            try:
+                entry = entries.get(timeout=0.5)
+            except Empty:
+                continue
+            if entry is _DONE:
+                running -= 1
+            else:
+                yield entry
+    finally:
+        stop.set()
+        for stream in streams:
+            _close(stream)
+
+def stream_logs(container_list, follow=False, since=None, until=None, tail='all'):
+    """
+    NDJSON lines {container, time, text} of the given containers' logs
+    """
+    options = dict(follow=follow, tail=tail)
+    if since is not None:
+        options['since'] = since
+    if until is not None:
+        options['until'] = until
+
+    entries = _followed(container_list, options) if follow else _merged(container_list, options)
+    for _, name, timestamp, text in entries:
+        yield dumps(dict(container=name, time=timestamp, text=text)) + '\n'
@@ -0,0 +1,208 @@
+"""
+prometheus metrics, aggregated across the workers of app_server.py
+
+every process counts in memory and writes its totals to METRICS_DIR at most
+every METRICS_FLUSH_INTERVAL seconds; a scrape adds up the files of all the
+processes, so counters of restarted workers are kept.
+"""
+
+import logging
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from json import dumps, loads
+from time import sleep, time
+from uuid import uuid4
+
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/docker-compose-ui-metrics')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+METRICS = {
+    'http_requests_total': (COUNTER, 'HTTP requests by route, method and status'),
+    'http_request_duration_seconds': (HISTOGRAM, 'HTTP request latency by route'),
+    'docker_api_requests_total': (COUNTER, 'docker API calls by method, endpoint and status'),
+    'docker_api_request_duration_seconds': (HISTOGRAM, 'docker API call latency by method and endpoint'),
+    'git_operation_duration_seconds': (HISTOGRAM, 'git operation duration by operation and result'),
+    'cache_requests_total': (COUNTER, 'cache lookups by cache and result (hit or miss)'),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_state = dict(pid=None, path=None, dirty=False)
+
+
+def _process_state():
+    """
+    start counting from zero in a new process, e.g. a freshly forked worker
+    """
+    if _state['pid'] != os.getpid():
+        with _lock:
+            if _state['pid'] != os.getpid():
+                _counters.clear()
+                _histograms.clear()
+                _state.update(pid=os.getpid(), dirty=False,
+                              path=os.path.join(METRICS_DIR, '%d-%s.json' % (os.getpid(), uuid4().hex[:8])))
+                thread = threading.Thread(target=_flush_loop, name='metrics-flush')
+                thread.daemon = True
+                thread.start()
+
+def _key(name, labels):
+    return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+def inc(name, value=1, **labels):
+    """
+    add value to a counter
+    """
+    _process_state()
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+        _state['dirty'] = True
+
+def observe(name, value, **labels):
+    """
+    record value in a histogram
+    """
+    _process_state()
+    key = _key(name, labels)
+    bucket = bisect_left(BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # per bucket counts (the last one is +Inf), sum
+            histogram = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        histogram[0][bucket] += 1
+        histogram[1] += value
+        _state['dirty'] = True
+
+@contextmanager
+def timed(name, **labels):
+    """
+    observe the duration of the block, labelled with result ok or error
+    """
+    started = time()
+    try:
+        yield
+    except BaseException:
+        observe(name, time() - started, result='error', **labels)
+        raise
+    observe(name, time() - started, result='ok', **labels)
+
+def cache_hit(cache):
+    """
+    count a cache lookup answered from the cache
+    """
+    inc('cache_requests_total', cache=cache, result='hit')
+
+def cache_miss(cache):
+    """
+    count a cache lookup that had to compute the value
+    """
+    inc('cache_requests_total', cache=cache, result='miss')
+
+def flush():
+    """
+    atomically write the totals of this process to METRICS_DIR
+    """
+    _process_state()
+    with _lock:
+        if not _state['dirty']:
+            return
+        data = dict(counters=[[name, labels, value] for (name, labels), value in _counters.items()],
+                    histograms=[[name, labels, histogram[0], histogram[1]]
+                                for (name, labels), histogram in _histograms.items()])
+        _state['dirty'] = False
+        path = _state['path']
+
+    if not os.path.isdir(METRICS_DIR):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as metrics_file:
+        metrics_file.write(dumps(data))
+    os.replace(tmp_path, path)
+
+def _flush_loop():
+    while True:
+        sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception: # pylint: disable=broad-except
+            logging.exception('metrics flush failed')
+
+def clear():
+    """
+    forget the totals written by previous runs, e.g. when the server starts
+    """
+    if os.path.isdir(METRICS_DIR):
+        for name in os.listdir(METRICS_DIR):
+            try:
+                os.remove(os.path.join(METRICS_DIR, name))
+            except OSError:
+                pass
+    with _lock:
+        # this process' totals are written again on its next flush
+        _state['dirty'] = bool(_counters or _histograms)
+
+def _collect():
+    """
+    totals of every process
+    """
+    counters = {}
+    histograms = {}
+    names = os.listdir(METRICS_DIR) if os.path.isdir(METRICS_DIR) else []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as metrics_file:
+                data = loads(metrics_file.read())
+        except (IOError, ValueError):
+            continue
+        for metric, labels, value in data['counters']:
+            key = (metric, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for metric, labels, buckets, total in data['histograms']:
+            key = (metric, tuple(tuple(label) for label in labels))
+            histogram = histograms.setdefault(key, [[0] * (len(BUCKETS) + 1), 0.0])
+            histogram[0] = [count + other for count, other in zip(histogram[0], buckets)]
+            histogram[1] += total
+    return counters, histograms
+
+def _labels_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (key, value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+                          for key, value in labels) + '}'
+
+def render():
+    """
+    metrics of all the workers in the prometheus text exposition format
+    """
+    flush()
+    counters, histograms = _collect()
+
+    lines = []
+    for metric, (kind, description) in sorted(METRICS.items()):
+        lines.append('# HELP %s %s' % (metric, description))
+        lines.append('# TYPE %s %s' % (metric, kind))
+        if kind == COUNTER:
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append('%s%s %s' % (metric, _labels_text(labels), value))
+            continue
+        for (name, labels), (buckets, total) in sorted(histograms.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in BUCKETS] + ['+Inf'], buckets):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (metric, _labels_text(labels + (('le', bound),)), cumulative))
+            lines.append('%s_sum%s %s' % (metric, _labels_text(labels), total))
+            lines.append('%s_count%s %d' % (metric, _labels_text(labels), cumulative))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,102 @@
+"""
+overview of all the projects of a user, for the project list page
+"""
+
+import logging
+import re
+from scripts.assets import project_asset, README, LOGO
+from scripts.bridge import client, project_config
+from scripts.container_state import get_index, LABEL_PROJECT, LABEL_SERVICE, LABEL_ONE_OFF
+from scripts.docker_hosts import fan_out
+
+# same as the pageSize constant of the UI
+PAGE_SIZE = 10
+
+
+def normalize_name(name):
+    """
+    compose project name of a project folder
+    """
+    return re.sub(r'[^-_a-z0-9]', '', name.lower())
+
+def _host_container_states():
+    """
+    (project, service, running) of every compose container of the current host, from a single listing
+    """
+    index = get_index()
+    if index is not None:
+        return index.states()
+    return [(item['Labels'][LABEL_PROJECT], item['Labels'].get(LABEL_SERVICE), item['State'] == 'running')
+            for item in client().containers(all=True)
+            if LABEL_PROJECT in (item['Labels'] or {}) and item['Labels'].get(LABEL_ONE_OFF) != 'True']
+
+def _states_by_host():
+    """
+    host name -> (container states, error) of every docker host, queried concurrently
+    """
+    return fan_out(_host_container_states)
+
+def container_states():
+    """
+    (project, service, running) of every compose container of all the docker hosts
+    """
+    states = []
+    for host_states, _ in _states_by_host().values():
+        states.extend(host_states or [])
+    return states
+
+def active_projects():
+    """
+    names of the compose projects running on any docker host
+    """
+    return sorted(set(project_name for project_name, _, running in container_states() if running))
+
+def container_counts():
+    """
+    running and total compose containers per docker host, and over all of them
+    """
+    hosts = {}
+    total = dict(running=0, total=0)
+    for name, (host_states, error) in _states_by_host().items():
+        if error is not None:
+            hosts[name] = dict(error=str(error))
+            continue
+        count = dict(running=len([state for state in host_states if state[2]]), total=len(host_states))
+        hosts[name] = count
+        total['running'] += count['running']
+        total['total'] += count['total']
+    return dict(hosts=hosts, **total)
+
+def _service_names(path):
+    try:
+        return [service['name'] for service in project_config(path).services]
+    except Exception: # pylint: disable=broad-except
+        logging.exception('cannot read compose config of ' + path)
+        return None
+
+def projects_overview(projects, page=0, page_size=PAGE_SIZE):
+    """
+    running state, container counts, services and readme/logo presence of
+    a page of the projects in a name -> path dict
+    """
+    counts = {}
+    for project_name, _, running in container_states():
+        count = counts.setdefault(project_name, dict(running=0, total=0))
+        count['total'] += 1
+        count['running'] += 1 if running else 0
+
+    names = sorted(projects)
+    items = []
+    for name in names[page * page_size:(page + 1) * page_size]:
+        path = projects[name]
+        count = counts.get(normalize_name(name), dict(running=0, total=0))
+        items.append(dict(
+            name=name,
+            path=path,
+            active=count['running'] > 0,
+            containers=count,
+            services=_service_names(path),
+            readme=project_asset(path, README) is not None,
+            logo=project_asset(path, LOGO) is not None))
+
+    return dict(projects=items, page=page, page_size=page_size, total=len(names))
@@ -0,0 +1,85 @@
+"""
+persisted allocation of upstream ports to project hostnames
+
+a hostname gets crc16(hostname) when that port is free, otherwise the next
+free port after it (wrapping around), so allocation stays deterministic for a
+given table. The nginx map is generated from this table.
+"""
+
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+from json import dumps, loads
+from scripts.proxyport import crc16, FIRST_PORT, LAST_PORT
+
+PORT_TABLE = os.getenv('PORT_TABLE', './ports.json')
+
+
+def _read(path):
+    try:
+        with open(path) as table_file:
+            return loads(table_file.read())
+    except (IOError, ValueError):
+        return {}
+
+def _write(path, table):
+    tmp_path = path + '.' + str(os.getpid())
+    with open(tmp_path, 'w') as table_file:
+        table_file.write(dumps(table, indent=1, sort_keys=True))
+    os.replace(tmp_path, path)
+
+@contextmanager
+def _locked_table(path=PORT_TABLE):
+    """
+    the table, locked against other processes and saved back if modified
+    """
+    with open(path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        table = _read(path)
+        original = dict(table)
+        yield table
+        if table != original:
+            _write(path, table)
+
+def probe_port(hostname, used):
+    """
+    first port not in used, starting at crc16(hostname)
+    """
+    start = crc16(hostname)
+    size = LAST_PORT - FIRST_PORT + 1
+    for offset in range(size):
+        port = FIRST_PORT + (start - FIRST_PORT + offset) % size
+        if port not in used:
+            if offset:
+                logging.warning('port %d of %s already allocated, using %d', start, hostname, port)
+            return port
+    raise ValueError('no upstream port left for ' + hostname)
+
+def _allocate(table, used, hostname):
+    if hostname not in table:
+        table[hostname] = probe_port(hostname, used)
+        used.add(table[hostname])
+    return table[hostname]
+
+def allocate_port(hostname):
+    """
+    upstream port of hostname, allocated on first use
+    """
+    with _locked_table() as table:
+        return _allocate(table, set(table.values()), hostname)
+
+def allocate_ports(hostnames):
+    """
+    hostname -> upstream port for many hostnames, in a single pass over the table
+    """
+    with _locked_table() as table:
+        used = set(table.values())
+        return dict((hostname, _allocate(table, used, hostname)) for hostname in hostnames)
+
+def release_port(hostname):
+    """
+    free the port of a removed project
+    """
+    with _locked_table() as table:
+        table.pop(hostname, None)
@@ -0,0 +1,69 @@
+"""
+cached registry of docker compose projects
+"""
+
+import logging
+import os
+import threading
+from time import time
+from scripts.find_files import find_yml_files
+from scripts.git_repo import start_git_sync, GIT_YML_PATH
+from scripts.metrics import cache_hit, cache_miss
+
+REGISTRY_TTL = float(os.getenv('PROJECT_REGISTRY_TTL', '30'))
+
+_lock = threading.Lock()
+_registry = {}
+
+
+def _key(path):
+    return os.path.normpath(path)
+
+def _mtime(path):
+    """
+    modification time of the projects folder, None if it does not exist
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def get_projects(path):
+    """
+    name -> folder map of the projects in path
+
+    the map is rescanned only when the folder mtime changed, the entry
+    is older than PROJECT_REGISTRY_TTL or it has been invalidated
+    """
+    key = _key(path)
+    mtime = _mtime(key)
+
+    with _lock:
+        entry = _registry.get(key)
+    if entry is not None and entry[0] == mtime and time() - entry[1] < REGISTRY_TTL:
+        cache_hit('projects')
+        return dict(entry[2])
+
+    cache_miss('projects')
+    projects = find_yml_files(path)
+    logging.info(projects)
+
+    with _lock:
+        _registry[key] = (mtime, time(), projects)
+    return dict(projects)
+
+def invalidate(path=None):
+    """
+    drop the cached projects of path, or of every folder if path is None
+    """
+    with _lock:
+        if path is None:
+            _registry.clear()
+        else:
+            _registry.pop(_key(path), None)
+
+def start_git_refresh():
+    """
+    keep the git checkout in sync in the background, dropping its cached projects on change
+    """
+    start_git_sync(lambda: invalidate(GIT_YML_PATH))
@@ -0,0 +1,51 @@
+"""
+upstream port of a project hostname
+
+same CRC16-CCITT as static/scripts/proxyport.js, which nginx runs for
+js_set $upstream proxyport; both must give the same port for a hostname
+"""
+
+FIRST_PORT = 1030
+LAST_PORT = 65535
+
+
+def _make_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+CRC_TABLE = _make_table()
+_SCALE = (LAST_PORT - FIRST_PORT) / float(LAST_PORT)
+
+
+def _to_bytes(hostname):
+    """
+    latin-1 bytes of hostname; like the js version, wider characters are rejected
+    """
+    if isinstance(hostname, str):
+        try:
+            return hostname.encode('latin-1')
+        except UnicodeEncodeError:
+            raise ValueError('hostname must be latin-1: %r' % hostname)
+    return memoryview(hostname).cast('B')
+
+def crc16(hostname):
+    """
+    port in FIRST_PORT..LAST_PORT for hostname (str, bytes or memoryview)
+    """
+    crc = 0xFFFF
+    table = CRC_TABLE
+    for byte in _to_bytes(hostname):
+        crc = table[byte ^ (crc >> 8)] ^ ((crc << 8) & 0xFFFF)
+    # allow for some ports to be used internally and not collide
+    return int(crc * _SCALE) + FIRST_PORT
+
+def crc16_ports(hostnames):
+    """
+    hostname -> port for many hostnames at once
+    """
+    return dict((hostname, crc16(hostname)) for hostname in hostnames)
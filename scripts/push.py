@@ -0,0 +1,151 @@
+"""
+server push of container state diffs over Server-Sent Events
+
+every project being viewed has a single watcher, shared by all the browser
+sessions looking at it, that recomputes its state when the container index
+reports a change
+"""
+
+import os
+import threading
+from json import dumps
+from queue import Queue, Empty, Full
+from time import time
+from scripts.bridge import ps_
+from scripts.container_state import get_index, add_listener
+from scripts.docker_hosts import current_host
+
+KEEPALIVE_INTERVAL = 15
+SUBSCRIBER_BUFFER = 100
+# a stream holds a request thread of the worker: it is closed after
+# SSE_STREAM_LIFETIME seconds, the browser reconnecting after SSE_RETRY_MS
+SSE_STREAM_LIFETIME = float(os.getenv('SSE_STREAM_LIFETIME', '300'))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', '3000'))
+# streams per worker, below WEB_THREADS so that other requests are still served
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', str(max(1, int(os.getenv('WEB_THREADS', '16')) // 2))))
+SSE_BUSY_RETRY_MS = int(os.getenv('SSE_BUSY_RETRY_MS', '30000'))
+
+_lock = threading.Lock()
+_watchers = {}
+_listening = []
+_streams = [0]
+
+
+def _sse(event, data):
+    return 'event: %s\ndata: %s\n\n' % (event, dumps(data))
+
+def _state(project, host):
+    index = get_index(host)
+    items = ps_(project, index.project_containers(project.name) if index is not None else None)
+    return dict((item['name'], item) for item in items)
+
+
+class ProjectWatcher(object):
+    """
+    broadcasts the container changes of a project to its subscribers
+    """
+
+    def __init__(self, project):
+        self.project = project
+        # refreshed from the events thread, which has no docker host selected
+        self.host = current_host()
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.state = _state(project, self.host)
+
+    def subscribe(self):
+        """
+        queue receiving the diffs of this project
+        """
+        queue = Queue(maxsize=SUBSCRIBER_BUFFER)
+        with self.lock:
+            self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        """
+        stop sending diffs to queue, return True when nobody is left
+        """
+        with self.lock:
+            if queue in self.subscribers:
+                self.subscribers.remove(queue)
+            return not self.subscribers
+
+    def refresh(self):
+        """
+        recompute the project state and broadcast what changed
+        """
+        state = _state(self.project, self.host)
+        with self.lock:
+            changed = [item for name, item in state.items() if self.state.get(name) != item]
+            removed = [name for name in self.state if name not in state]
+            self.state = state
+            subscribers = list(self.subscribers)
+        if not changed and not removed:
+            return
+
+        diff = dict(changed=changed, removed=removed)
+        for queue in subscribers:
+            try:
+                queue.put_nowait(diff)
+            except Full:
+                # a stalled client gets the full state once it catches up
+                queue.queue.clear()
+                queue.put_nowait(None)
+
+
+def _on_change(project_name):
+    with _lock:
+        watchers = [watcher for watcher in _watchers.values()
+                    if project_name is None or watcher.project.name == project_name]
+    for watcher in watchers:
+        watcher.refresh()
+
+def _get_watcher(key, project):
+    with _lock:
+        if not _listening:
+            add_listener(_on_change)
+            _listening.append(True)
+        watcher = _watchers.get(key)
+        if watcher is None:
+            watcher = _watchers[key] = ProjectWatcher(project)
+    return watcher
+
+def watch_project(key, project):
+    """
+    SSE stream: the project state, then a diff after every change, for
+    SSE_STREAM_LIFETIME seconds; closed at once when the worker already
+    serves SSE_MAX_STREAMS streams, the browser retrying later
+    """
+    with _lock:
+        busy = _streams[0] >= SSE_MAX_STREAMS
+        if not busy:
+            _streams[0] += 1
+    if busy:
+        yield 'retry: %d\n\n' % SSE_BUSY_RETRY_MS
+        return
+
+    try:
+        watcher = _get_watcher(key, project)
+        queue = watcher.subscribe()
+        try:
+            yield 'retry: %d\n\n' % SSE_RETRY_MS
+            yield _sse('state', list(watcher.state.values()))
+            closing = time() + SSE_STREAM_LIFETIME
+            while time() < closing:
+                try:
+                    diff = queue.get(timeout=max(0, min(KEEPALIVE_INTERVAL, closing - time())))
+                except Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if diff is None:
+                    yield _sse('state', list(watcher.state.values()))
+                else:
+                    yield _sse('diff', diff)
+        finally:
+            with _lock:
+                if watcher.unsubscribe(queue) and _watchers.get(key) is watcher:
+                    del _watchers[key]
+    finally:
+        with _lock:
+            _streams[0] -= 1
@@ -5,7 +5,7 @@ inspired by http://flask.pocoo.org/snippets/8/
 
 from functools import wraps
 import os
-from flask import request, Response
+from flask import request, session, Response
 
 def authentication_enabled():
     """
@@ -54,3 +54,28 @@ def requires_auth(func):
             return func(*args, **kwargs)
         return authenticate()
     return decorated
+
+def is_admin():
+    """
+    check if the request comes from an administrator: authenticated with the
+    basic authentication credentials, or from a user listed in ADMIN_USERS
+    """
+    auth = request.authorization
+    if authentication_enabled() and auth and check_auth(auth.username, auth.password):
+        return True
+    admins = [user.strip() for user in os.getenv('ADMIN_USERS', '').split(',') if user.strip()]
+    return session.get('username') in admins
+
+def requires_admin(func):
+    """
+    requires_admin annotation
+    """
+    @wraps(func)
+    def decorated(*args, **kwargs):
+        """
+        decorator
+        """
+        if is_admin():
+            return func(*args, **kwargs)
+        return "forbidden", 403
+    return decorated
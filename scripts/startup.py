@@ -0,0 +1,57 @@
+"""
+startup phase of a worker process
+
+importing main only defines the app. What needs the docker daemon, git or
+the network runs here, once per process and by default in a background
+thread, so that a restarted worker answers right away.
+"""
+
+import logging
+import os
+import threading
+from scripts.container_state import get_index
+from scripts.idle import start_idle_monitor
+from scripts.lazy import lazy_import, import_module
+from scripts.project_registry import start_git_refresh
+
+# loaded ahead of the first request that needs them
+PRELOAD_MODULES = ('compose.cli.command', 'compose.container', 'compose.service', 'docker', 'git', 'requests')
+
+compose_utils = lazy_import('compose.cli.utils')
+
+_lock = threading.Lock()
+_started_pid = None
+
+
+def _warm_up():
+    for name in PRELOAD_MODULES:
+        try:
+            import_module(name)
+        except ImportError:
+            logging.exception('cannot preload ' + name)
+    try:
+        logging.info(compose_utils.get_version_info('full'))
+        start_git_refresh()
+        # start following the docker events
+        get_index()
+    except Exception: # pylint: disable=broad-except
+        logging.exception('startup failed')
+
+def startup(background=True):
+    """
+    run the startup phase of this process, unless it already ran
+    """
+    global _started_pid # pylint: disable=global-statement
+
+    with _lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+
+    start_idle_monitor()
+    if background:
+        thread = threading.Thread(target=_warm_up, name='startup')
+        thread.daemon = True
+        thread.start()
+    else:
+        _warm_up()
@@ -0,0 +1,29 @@
+"""
+docker unix socket adapter with a configurable connection pool size
+
+kept apart from client_pool so that docker is only imported with the first client
+"""
+
+from docker.transport import UnixAdapter
+from docker.transport.unixconn import UnixHTTPConnectionPool
+
+
+class PooledUnixAdapter(UnixAdapter):
+    """
+    unix socket adapter keeping up to pool_size idle connections per pool
+    """
+
+    def __init__(self, socket_path, timeout, pool_size):
+        super(PooledUnixAdapter, self).__init__(socket_path, timeout)
+        self.pool_size = pool_size
+
+    def get_connection(self, url, proxies=None):
+        with self.pools.lock:
+            pool = self.pools.get(url)
+            if pool:
+                return pool
+
+            pool = UnixHTTPConnectionPool(url, self.socket_path, self.timeout, maxsize=self.pool_size)
+            self.pools[url] = pool
+
+        return pool
@@ -0,0 +1,90 @@
+"""
+nginx map of project hostnames to upstream ports
+
+nginx.conf includes the generated file in a `map $host $upstream` block, so
+requests to known projects are routed without running njs and get the port
+recorded in the port table; proxyport.js is only evaluated for hostnames
+missing from the map
+"""
+
+import logging
+import os
+from scripts.bridge import client
+from scripts.docker_hosts import using_host, DEFAULT_HOST
+from scripts.project_registry import get_projects
+from scripts.port_table import allocate_ports
+
+UPSTREAM_MAP = os.getenv('UPSTREAM_MAP', './nginx-maps/upstreams.map')
+# container_name of nginx in docker-compose.yml; empty to never reload nginx
+NGINX_CONTAINER = os.getenv('NGINX_CONTAINER', 'docker-compose-ui-nginx')
+USERS_PATH = './users'
+
+
+def project_hosts(site, users_path=USERS_PATH):
+    """
+    hostname -> (user, project name, project path) of the projects of every user
+    """
+    hosts = {}
+    if not os.path.isdir(users_path):
+        return hosts
+    for user in sorted(os.listdir(users_path)):
+        folder = os.path.join(users_path, user)
+        if os.path.isdir(folder):
+            for name, path in sorted(get_projects(folder).items()):
+                hosts[name + '.' + site] = (user, name, path)
+    return hosts
+
+def project_hostnames(site, users_path=USERS_PATH):
+    """
+    hostnames of the projects of every user
+    """
+    return sorted(project_hosts(site, users_path))
+
+def render_map(ports):
+    """
+    content of the map include for a hostname -> port dict
+    """
+    lines = ['# generated by docker-compose-ui, do not edit']
+    lines.extend('%s %d;' % (hostname, ports[hostname]) for hostname in sorted(ports))
+    return '\n'.join(lines) + '\n'
+
+def reload_nginx():
+    """
+    ask the NGINX_CONTAINER nginx to reload its configuration (SIGHUP)
+    """
+    if NGINX_CONTAINER:
+        logging.info('reload nginx ' + NGINX_CONTAINER)
+        # nginx runs next to docker-compose-ui, whatever host the request selected
+        with using_host(DEFAULT_HOST):
+            client().kill(NGINX_CONTAINER, signal='SIGHUP')
+
+def write_map(ports, path=UPSTREAM_MAP):
+    """
+    atomically write the map include, return True if its content changed
+    """
+    content = render_map(ports)
+    try:
+        with open(path) as map_file:
+            if map_file.read() == content:
+                return False
+    except IOError:
+        pass
+
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    tmp_path = path + '.' + str(os.getpid())
+    with open(tmp_path, 'w') as map_file:
+        map_file.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+def update_upstream_map(site):
+    """
+    regenerate the map from the projects on disk and reload nginx when it changed
+    """
+    if write_map(allocate_ports(project_hostnames(site))):
+        try:
+            reload_nginx()
+        except Exception: # pylint: disable=broad-except
+            logging.exception('nginx reload failed')
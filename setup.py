@@ -4,6 +4,7 @@ import socket
 import fileinput
 import os
 from scripts.bridge import get_project
+from scripts.upstream_map import update_upstream_map
 
 dictCloudFlare = {}
 dictCloudFlare["EmailID"] = input("Please enter your email for CloudFlare: ")
@@ -61,6 +62,9 @@ for line in fileinput.input(['nginx.tmpl.conf']):
     oFile.write(line.replace('dockerhost', sIp))
 oFile.close()
 
+#routing map of the project hostnames, included by nginx.conf
+update_upstream_map(oCreds["Site"])
+
 #we will want to run docker-compose up equivalent here
 sPath = os.path.dirname(os.path.abspath(__file__))
 get_project(sPath).up()
@@ -11,6 +11,7 @@ angular.module('composeUiApp')
   .controller('MainCtrl', function ($scope, $resource, pageSize) {
 
       var Projects = $resource('api/v1/projects');
+      var Assets = $resource('api/v1/assets');
 
       $scope.isActive = function (id, l) {
           var normalizedId = id
@@ -22,6 +23,9 @@ angular.module('composeUiApp')
       function reload(displayMessage) {
           Projects.get(function (data) {
               $scope.projects = data;
+              Assets.get(function (assets) {
+                  $scope.assets = assets.assets;
+              });
               if (displayMessage) {
                   alertify.success(Object.keys(data.projects).length + ' projects reloaded');
               }
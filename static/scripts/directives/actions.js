@@ -1,7 +1,7 @@
 'use strict';
 
 angular.module('composeUiApp')
-  .directive('actions', function ($resource, projectService, logService) {
+  .directive('actions', function ($resource, projectService, logService, jobService) {
 
       return {
           restrict: 'E',
@@ -54,9 +54,14 @@ angular.module('composeUiApp')
               $scope.pull = function () {
                   $scope.working = true;
                   var id = $scope.projectId;
-                  Project.update({id: id}, function () {
-                      alertify.success(id + ' pull terminated');
-                      $scope.working = false;
+                  Project.update({id: id}, function (data) {
+                      jobService.wait(data).then(function () {
+                          alertify.success(id + ' pull terminated');
+                          $scope.working = false;
+                      }, function (err) {
+                          $scope.working = false;
+                          alertify.alert(err.data);
+                      });
                   }, function (err) {
                       $scope.working = false;
                       alertify.alert(err.data);
@@ -84,13 +89,18 @@ angular.module('composeUiApp')
               function updateProjectStatus(fn, msg) {
                   $scope.working = true;
                   var id = $scope.projectId;
-                  fn({id: id}, function () {
-                      alertify.success(msg);
-                      $scope.working = false;
-                      Project.get({id: id}, function (data) {
-                          $scope.services = projectService.groupByService(data);
+                  fn({id: id}, function (data) {
+                      jobService.wait(data).then(function () {
+                          alertify.success(msg);
+                          $scope.working = false;
+                          Project.get({id: id}, function (data) {
+                              $scope.services = projectService.groupByService(data);
+                          });
+                          $scope.$parent.$parent.reload(false);
+                      }, function (err) {
+                          $scope.working = false;
+                          alertify.alert(err.data);
                       });
-                      $scope.$parent.$parent.reload(false);
                   }, function (err) {
                       $scope.working = false;
                       alertify.alert(err.data);
@@ -102,9 +112,14 @@ angular.module('composeUiApp')
               $scope.build = function () {
                   $scope.working = true;
                   var id = $scope.projectId;
-                  Project.build({id: id}, function () {
-                      alertify.success(id + ' build terminated');
-                      $scope.working = false;
+                  Project.build({id: id}, function (data) {
+                      jobService.wait(data).then(function () {
+                          alertify.success(id + ' build terminated');
+                          $scope.working = false;
+                      }, function (err) {
+                          $scope.working = false;
+                          alertify.alert(err.data);
+                      });
                   }, function (err) {
                       $scope.working = false;
                       alertify.alert(err.data);
@@ -17,7 +17,7 @@ angular.module('composeUiApp')
 		   }
       });
   })
-  .directive('projectDetail', function($resource, $log, projectService, $window, $location){
+  .directive('projectDetail', function($resource, $log, projectService, jobService, $window, $location){
       return {
           restrict: 'E',
           scope: {
@@ -43,8 +43,46 @@ angular.module('composeUiApp')
               var Readme = $resource('api/v1/projects/readme/:id');
               var WebConsolePattern = $resource('api/v1/web_console_pattern');
 
+              var events = null;
+              var containers = {};
+
+              function showContainers() {
+                  $scope.services = projectService.groupByService({containers: _.values(containers)});
+              }
+
+              function listen(id) {
+                  if (events) {
+                      events.close();
+                  }
+                  if (!window.EventSource) {
+                      return;
+                  }
+                  events = new EventSource('api/v1/events/' + encodeURIComponent(id));
+                  events.addEventListener('state', function (e) {
+                      containers = _.keyBy(JSON.parse(e.data), 'name');
+                      $scope.$apply(showContainers);
+                  });
+                  events.addEventListener('diff', function (e) {
+                      var diff = JSON.parse(e.data);
+                      _.each(diff.changed, function (item) {
+                          containers[item.name] = item;
+                      });
+                      _.each(diff.removed, function (name) {
+                          delete containers[name];
+                      });
+                      $scope.$apply(showContainers);
+                  });
+              }
+
+              $scope.$on('$destroy', function () {
+                  if (events) {
+                      events.close();
+                  }
+              });
+
               $scope.$watch('projectId', function (val) {
                   if (val) {
+                      listen(val);
                       $log.debug('refresh ' + val);
                       Project.get({id: val}, function (data) {
                           $scope.services = projectService.groupByService(data);
@@ -97,9 +135,14 @@ angular.module('composeUiApp')
               $scope.rebuild = function(serviceName) {
                   $scope.working = true;
                   Project.save({id: $scope.projectId, service_names: [serviceName], do_build: true},
-            function () {
-                $scope.working = false;
-                alertify.success(serviceName + ' rebuild successful.');
+            function (data) {
+                jobService.wait(data).then(function () {
+                    $scope.working = false;
+                    alertify.success(serviceName + ' rebuild successful.');
+                }, function (err) {
+                    $scope.working = false;
+                    alertify.alert(err.data);
+                });
             },
             function (err) {
                 $scope.working = false;
@@ -119,11 +162,16 @@ angular.module('composeUiApp')
                       if (!isNaN(num)) {
                           $scope.working = true;
 
-                          Service.scale({service: service, project: $scope.projectId, num: num}, function () {
+                          Service.scale({service: service, project: $scope.projectId, num: num}, function (data) {
 
-                              Project.get({id: $scope.projectId}, function (data) {
-                                  $scope.services = projectService.groupByService(data);
-                                  $scope.working = false;
+                              jobService.wait(data).then(function () {
+                                  Project.get({id: $scope.projectId}, function (data) {
+                                      $scope.services = projectService.groupByService(data);
+                                      $scope.working = false;
+                                  }, function (err) {
+                                      $scope.working = false;
+                                      alertify.alert(err.data);
+                                  });
                               }, function (err) {
                                   $scope.working = false;
                                   alertify.alert(err.data);
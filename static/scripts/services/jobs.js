@@ -0,0 +1,35 @@
+'use strict';
+
+angular.module('composeUiApp')
+  .factory('jobService', function ($resource, $q, $timeout) {
+
+      var Job = $resource('api/v1/jobs/:id');
+
+      function wait(data) {
+          var deferred = $q.defer();
+
+          if (!data || !data.job) {
+              deferred.resolve(data);
+              return deferred.promise;
+          }
+
+          function poll() {
+              Job.get({id: data.job}, function (job) {
+                  if (job.state === 'finished') {
+                      deferred.resolve(job);
+                  } else if (job.state === 'failed' || job.state === 'cancelled') {
+                      deferred.reject({data: job.error || job.state});
+                  } else {
+                      $timeout(poll, 1000);
+                  }
+              }, deferred.reject);
+          }
+
+          poll();
+          return deferred.promise;
+      }
+
+      return {
+          wait: wait
+      };
+  });
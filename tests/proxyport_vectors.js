@@ -0,0 +1,22 @@
+// [hostname, port] vectors of static/scripts/proxyport.js for test_proxyport.py
+// usage: node tests/proxyport_vectors.js static/scripts/proxyport.js > tests/proxyport_vectors.json
+var fs = require('fs'), vm = require('vm');
+var sandbox = {};
+vm.runInNewContext(fs.readFileSync(process.argv[2], 'utf8'), sandbox);
+var seed = 20261018;
+function random() { seed = (seed * 1103515245 + 12345) % 2147483648; return seed / 2147483648; }
+var alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789-.';
+var hosts = ['', 'a', 'localhost', 'test-rhildred.rhlab.io', 'rhildred.rhlab.io', 'apps.rhlab.io',
+             'theia-user0.rhlab.io', 'web-u0p0.example.com', 'UPPER.Example.COM', 'café.example',
+             'ÿþ\u0080', 'host:8080', 'a.b.c.d.e.f.g.h.i.j.k.l.m.n.o.p.q.r.s.t.u.v.w.x.y.z'];
+for (var n = 0; n < 200; n++) {
+    var length = 1 + Math.floor(random() * 40), s = '';
+    for (var i = 0; i < length; i++) {
+        s += random() < 0.05 ? String.fromCharCode(32 + Math.floor(random() * 224))
+                             : alphabet[Math.floor(random() * alphabet.length)];
+    }
+    hosts.push(s);
+}
+console.log("[\n" + hosts.map(function (host) {
+    return JSON.stringify([host, sandbox.crc16(host)]);
+}).join(",\n") + "\n]");
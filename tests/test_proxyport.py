@@ -0,0 +1,52 @@
+"""
+scripts/proxyport.py against ports computed by static/scripts/proxyport.js
+
+the vectors in proxyport_vectors.json come from the js version, regenerate
+them with: node tests/proxyport_vectors.js static/scripts/proxyport.js > tests/proxyport_vectors.json
+
+usage: python3 -m unittest tests.test_proxyport
+"""
+
+import os
+import unittest
+from json import loads
+from scripts.proxyport import crc16, crc16_ports
+
+VECTORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'proxyport_vectors.json')
+
+
+def _vectors():
+    with open(VECTORS_PATH, encoding='utf8') as vectors_file:
+        return [tuple(vector) for vector in loads(vectors_file.read())]
+
+
+class ProxyPortTest(unittest.TestCase):
+    """
+    same port as nginx for every hostname
+    """
+
+    def test_known_hostname(self):
+        self.assertEqual(crc16('test-rhildred.rhlab.io'), 32252)
+
+    def test_js_vectors(self):
+        for hostname, port in _vectors():
+            self.assertEqual(crc16(hostname), port, hostname)
+
+    def test_bytes_and_memoryview(self):
+        for hostname, port in _vectors():
+            data = hostname.encode('latin-1')
+            self.assertEqual(crc16(data), port, hostname)
+            self.assertEqual(crc16(memoryview(data)), port, hostname)
+
+    def test_many_hostnames(self):
+        vectors = _vectors()
+        self.assertEqual(crc16_ports([hostname for hostname, _ in vectors]), dict(vectors))
+
+    def test_wide_characters_rejected(self):
+        # the js version throws a RangeError
+        with self.assertRaises(ValueError):
+            crc16('Ā.example')
+
+
+if __name__ == '__main__':
+    unittest.main()